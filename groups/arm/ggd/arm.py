@@ -59,8 +59,17 @@ import utils
 from . import arm_servo_ids
 from gg_group_setup import GroupConfigFile
 
-from stages import ArmStages, NO_BOX_FOUND
-from servo.servode import Servo, ServoProtocol, ServoGroup
+from camera import CameraService
+from image_processor import DEBUG_POLICIES, DEBUG_ON_DETECT, \
+    EDGE_THRESHOLD, THRESHOLD_MODES, THRESHOLD_FIXED, BackgroundModel
+from vision_profile import load_profile, profile_file
+from calibration import load_goal_table, goal_table_file
+from kinematics import ArmKinematics
+from vision_worker import VisionWorker
+from stages import ArmStages, NO_BOX_FOUND, MAX_IMAGE_WIDTH, \
+    MAX_IMAGE_HEIGHT, MIN_OBJECT_SIZE
+from servo.servode import Servo, ServoProtocol, ServoGroup, ESTOP, \
+    TELEMETRY
 
 
 dir_path = os.path.dirname(os.path.realpath(__file__))
@@ -74,6 +83,7 @@ log.addHandler(handler)
 log.setLevel(logging.INFO)
 
 commands = ['run', 'stop']
+PICK_QUEUE_TTL = 10  # seconds the other candidates of a find stay pickable
 
 should_loop = True
 
@@ -204,26 +214,27 @@ def _stage_message(stage, text='', stage_result=None):
 
 def _arm_message(servo_group):
     data = []
+    # one block read per servo instead of a read per register
+    now = datetime.datetime.now()
+    snapshot = servo_group.snapshot()
     for servo in servo_group:
         log.debug("[_arm_message] servo:{0}".format(servo))
+        values = snapshot[servo]
+        # values coalesced from an earlier read when the bus was too busy
+        # are stamped with the time they were read, and marked stale
+        read_time = servo_group[servo].block_time
         data.append({
             "sensor_id": "arm_servo_id_{0:02d}".format(
                 servo_group[servo].servo_id),
-            "ts": datetime.datetime.now().isoformat(),
-            "present_speed":
-                servo_group[servo]['present_speed'],
-            "present_position":
-                servo_group[servo]['present_position'],
-            "present_load":
-                servo_group[servo]['present_load'],
-            "goal_position":
-                servo_group[servo]['goal_position'],
-            "moving":
-                servo_group[servo]['moving'],
-            "present_temperature":
-                servo_group[servo]['present_temperature'],
-            "torque_limit":
-                servo_group[servo]['torque_limit']
+            "ts": (read_time or now).isoformat(),
+            "stale": read_time is None or read_time < now,
+            "present_speed": values.get('present_speed'),
+            "present_position": values.get('present_position'),
+            "present_load": values.get('present_load'),
+            "goal_position": values.get('goal_position'),
+            "moving": values.get('moving'),
+            "present_temperature": values.get('present_temperature'),
+            "torque_limit": values.get('torque_limit')
         })
 
     msg = {
@@ -241,11 +252,14 @@ class ArmControlThread(threading.Thread):
     # TODO move control into Lambda pending being able to access serial port
 
     def __init__(self, servo_group, event, stage_topic, mqtt_client,
-                 master_shadow, args=(), kwargs={}):
+                 master_shadow, image_processor=None, goal_table=None,
+                 args=(), kwargs={}):
         super(ArmControlThread, self).__init__(
             name="arm_control_thread", args=args, kwargs=kwargs
         )
         self.sg = servo_group
+        self.ip = image_processor
+        self.goal_table = goal_table
         log.debug("[act.__init__] servo_group:{0}".format(self.sg))
         self.cmd_event = event
         self.active_state = 'initialized'
@@ -259,6 +273,9 @@ class ArmControlThread(threading.Thread):
         self.mqtt_client = mqtt_client
         self.master_shadow = master_shadow
         self.found_box = None
+        # the other candidates of the last find, picked before finding again
+        self.pick_queue = collections.deque()
+        self.pick_queue_time = 0
 
         self.master_shadow.shadowRegisterDeltaCallback(self.shadow_mgr)
         log.debug("[arm.__init__] shadowRegisterDeltaCallback()")
@@ -321,7 +338,7 @@ class ArmControlThread(threading.Thread):
         self.mqtt_client.publish(
             self.stage_topic, _stage_message("home", "begin"), 0
         )
-        stage_result = arm.stage_home()
+        stage_result = arm.stage_home(should_run=self.cmd_event)
         self.mqtt_client.publish(
             self.stage_topic, _stage_message("home", "end", stage_result), 0
         )
@@ -330,27 +347,59 @@ class ArmControlThread(threading.Thread):
 
     def find(self):
         log.debug("[act.find] [begin]")
-        arm = ArmStages(self.sg)
+        arm = ArmStages(self.sg, image_processor=self.ip)
         loop = True
         self.found_box = NO_BOX_FOUND
         stage_result = NO_BOX_FOUND
         self.mqtt_client.publish(
             self.stage_topic, _stage_message("find", "begin"), 0
         )
+        if self.pick_queue and \
+                time.time() - self.pick_queue_time > PICK_QUEUE_TTL:
+            log.info("[act.find] dropping stale pick_queue:{0}".format(
+                len(self.pick_queue)))
+            self.pick_queue.clear()
+        if self.pick_queue and self.cmd_event.is_set():
+            # the scene was already processed, but the belt may have moved
+            # its next candidate, so confirm it is still there
+            stage_result = arm.stage_confirm(
+                self.pick_queue.popleft(), should_run=self.cmd_event)
+            if stage_result['x'] and stage_result['y']:
+                log.info("[act.find] queued box:{0} remaining:{1}".format(
+                    stage_result, len(self.pick_queue)))
+                self.found_box = stage_result
+                loop = False
+            else:
+                log.info("[act.find] queued box moved, finding again")
+                self.pick_queue.clear()
         while self.cmd_event.is_set() and loop is True:
-            stage_result = arm.stage_find()
+            stage_result = arm.stage_find(should_run=self.cmd_event)
             if stage_result['x'] and stage_result['y']:  # X & Y start as none
+                # only boxes the arm can reach are picked, the largest first
+                reachable = self._reachable(
+                    stage_result.get('candidates') or [stage_result])
+                if not reachable:
+                    # logged at DEBUG like a find without a box, as the
+                    # unreachable box is found again at every find
+                    log.debug("[act.find] no reachable box:{0}".format(
+                        stage_result))
+                    self._wait_to_find()
+                    continue
                 log.info("[act.find] found box:{0}".format(stage_result))
-                self.found_box = stage_result
+                self.found_box = reachable[0]
+                self.pick_queue = collections.deque(reachable[1:])
+                self.pick_queue_time = time.time()
                 log.info("[act.find] self.found_box:{0}".format(
                     self.found_box))
                 loop = False
             else:
-                log.info("[act.find] self.found_box:{0}".format(
+                # logged at DEBUG as a streaming camera finds at its frame
+                # rate while there is no box
+                log.debug("[act.find] self.found_box:{0}".format(
                     self.found_box
                 ))
-                log.info("[act.find] no box:{0}".format(stage_result))
-                time.sleep(1)
+                log.debug("[act.find] no box:{0}".format(stage_result))
+                self._wait_to_find()
 
         # TODO get image upload working with discovery based interaction
         # # upload the image file just before stage complete
@@ -379,9 +428,21 @@ class ArmControlThread(threading.Thread):
         log.debug("[act.find] [end]")
         return stage_result
 
+    def _wait_to_find(self):
+        # a streaming camera already waits for the next fresh frame
+        if self.ip is None or not self.ip.camera.streaming:
+            time.sleep(1)
+
+    def _reachable(self, candidates):
+        # solve the goals of all candidates at once, dropping unreachable ones
+        if self.goal_table is None or not candidates:
+            return candidates
+        goals = self.goal_table.goals_of(candidates)
+        return [c for c, g in zip(candidates, goals) if g is not None]
+
     def pick(self):
         log.debug("[act.pick] [begin]")
-        arm = ArmStages(self.sg)
+        arm = ArmStages(self.sg, goal_table=self.goal_table)
         self.mqtt_client.publish(
             self.stage_topic, _stage_message("pick", "begin"), 0
         )
@@ -389,8 +450,12 @@ class ArmControlThread(threading.Thread):
         self.found_box = NO_BOX_FOUND
         log.info("[act.pick] pick_box:{0}".format(pick_box))
         log.info("[act.pick] self.found_box:{0}".format(self.found_box))
-        stage_result = arm.stage_pick(previous_results=pick_box,
+        stage_result = arm.stage_pick(should_run=self.cmd_event,
+                                      previous_results=pick_box,
                                       cartesian=False)
+        if not stage_result.get('pick_complete'):
+            # the scene may have changed, so find its candidates again
+            self.pick_queue.clear()
         self.mqtt_client.publish(
             self.stage_topic, _stage_message("pick", "end", stage_result), 0
         )
@@ -403,7 +468,7 @@ class ArmControlThread(threading.Thread):
         self.mqtt_client.publish(
             self.stage_topic, _stage_message("sort", "begin"), 0
         )
-        stage_result = arm.stage_sort()
+        stage_result = arm.stage_sort(should_run=self.cmd_event)
         self.mqtt_client.publish(
             self.stage_topic, _stage_message("sort", "end", stage_result), 0
         )
@@ -425,8 +490,11 @@ class ArmControlThread(threading.Thread):
             ]
             log.info("[emergency_stop_arm] stop_positions:{0}".format(
                 stop_positions))
-            self.sg.write_values(
-                register='goal_position', values=stop_positions)
+            # the stop goes ahead of every other transaction waiting for the
+            # bus
+            with self.sg.priority(ESTOP):
+                self.sg.write_values(
+                    register='goal_position', values=stop_positions)
             self.active_state = 'stopped'
             log.info("[emergency_stop_arm] active_state:{0}".format(
                 self.active_state))
@@ -440,6 +508,7 @@ class ArmControlThread(threading.Thread):
             return
 
         arm.stage_stop()
+        self.pick_queue.clear()
         self.active_state = 'stopped'
         log.info("[stop_arm] active_state:{0}".format(
             self.active_state))
@@ -478,7 +547,10 @@ class ArmTelemetryThread(threading.Thread):
 
     def run(self):
         while should_loop:
-            msg = _arm_message(self.sg)
+            # telemetry waits behind control, or is coalesced when the bus
+            # is busy
+            with self.sg.priority(TELEMETRY):
+                msg = _arm_message(self.sg)
             self.mqtt_client.publish(self.telemetry_topic, json.dumps(msg), 0)
             time.sleep(self.frequency)  # sample rate
 
@@ -509,6 +581,35 @@ if __name__ == "__main__":
                         help="Modify the default telemetry sample frequency.")
     parser.add_argument('--debug', default=False, action='store_true',
                         help="Activate debug output.")
+    parser.add_argument('--debug_images', default=DEBUG_ON_DETECT,
+                        choices=DEBUG_POLICIES,
+                        help="Which find frames have their debug images "
+                             "written.")
+    parser.add_argument('--debug_sample', default=10, type=int,
+                        help="Write the debug images of one in this many "
+                             "frames when using the 'sample' policy.")
+    parser.add_argument('--pyramid', default=False, action='store_true',
+                        help="Find objects in a shrunk frame first and only "
+                             "search the full frame around them.")
+    parser.add_argument('--threshold_mode', default=THRESHOLD_FIXED,
+                        choices=THRESHOLD_MODES,
+                        help="How the edge threshold of a frame is chosen.")
+    parser.add_argument('--vision_profile', default=None,
+                        help="The arm's calibrated vision profile. Defaults "
+                             "to '<device_name>_vision.json' next to arm.py.")
+    parser.add_argument('--background', default=False, action='store_true',
+                        help="Learn the empty scene and only find objects "
+                             "where frames differ from it.")
+    parser.add_argument('--similar_frame_diff', default=6, type=int,
+                        help="Keep the last find results while frames differ "
+                             "from the last processed frame by less than "
+                             "this luma anywhere. 0 processes every frame.")
+    parser.add_argument('--goal_table', default=None,
+                        help="The arm's calibrated pick goal table. Defaults "
+                             "to '<device_name>_goals.npy' next to arm.py.")
+    parser.add_argument('--ik', default=False, action='store_true',
+                        help="Solve pick goals with the arm's inverse "
+                             "kinematics instead of the goal table.")
     pa = parser.parse_args()
     if pa.debug:
         log.setLevel(logging.DEBUG)
@@ -519,7 +620,34 @@ if __name__ == "__main__":
         pa.private_key, pa.group_ca_path
     )
 
-    with ServoProtocol() as sp:
+    profile = load_profile(
+        pa.vision_profile or profile_file(dir_path, pa.device_name))
+    if pa.ik:
+        goal_table = ArmKinematics()
+    else:
+        goal_table = load_goal_table(
+            pa.goal_table or goal_table_file(dir_path, pa.device_name))
+
+    # frames are processed in a worker process, started before the camera
+    # so that the camera's threads stay out of it. The camera stays open,
+    # warmed up and streaming for the life of the arm process.
+    with VisionWorker(res_width=MAX_IMAGE_WIDTH,
+                      res_height=MAX_IMAGE_HEIGHT,
+                      debug=pa.debug_images,
+                      debug_sample=pa.debug_sample,
+                      min_object_size=MIN_OBJECT_SIZE, track=True,
+                      pyramid=pa.pyramid,
+                      threshold=profile.get('threshold', EDGE_THRESHOLD),
+                      threshold_mode=pa.threshold_mode,
+                      background=BackgroundModel() if pa.background
+                      else None,
+                      similar_frame_diff=pa.similar_frame_diff or None
+                      ) as ip, \
+            ServoProtocol() as sp, \
+            CameraService(resolution=(MAX_IMAGE_WIDTH, MAX_IMAGE_HEIGHT),
+                          streaming=True,
+                          exposure=profile.get('exposure')) as camera:
+        ip.camera = camera
         for servo_id in arm_servo_ids:
             sp.ping(servo=servo_id)
 
@@ -538,7 +666,8 @@ if __name__ == "__main__":
         )
         act = ArmControlThread(
             sg, cmd_event, stage_topic=pa.stage_topic,
-            mqtt_client=remote_mqtt, master_shadow=m_shadow
+            mqtt_client=remote_mqtt, master_shadow=m_shadow,
+            image_processor=ip, goal_table=goal_table
         )
         amt.start()
         act.start()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You may not
+# use this file except in compliance with the License. A copy of the License is
+# located at
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""
+Camera to arm calibration.
+
+A `GoalTable` holds the (base, femur, tibia) servo goals of a pick at every
+pixel the camera can find a box at, so a pick's goals are a lookup instead of
+being calculated for every pick.
+
+The table of an arm is fitted from pick trials: the pixel a box was found at
+and the servo positions the arm picked it up with. Record a trial by placing a
+box, finding it, then moving the limp arm down onto the box by hand:
+    python calibration.py record <device_name>_trials.json <x> <y>
+Once trials cover the camera's view, fit the arm's table:
+    python calibration.py fit <device_name>_trials.json <device_name>_goals.npy
+
+Without a fitted table the arm uses the table of the tuned `polar_goals`.
+"""
+import os
+import json
+import argparse
+import logging
+import numpy as np
+
+from stages import polar_goals, MAX_IMAGE_WIDTH, MAX_IMAGE_HEIGHT
+
+log = logging.getLogger('calibration')
+handler = logging.StreamHandler()
+formatter = logging.Formatter(
+    '%(asctime)s|%(name)-8s|%(levelname)s: %(message)s')
+handler.setFormatter(formatter)
+log.addHandler(handler)
+log.setLevel(logging.INFO)
+
+GOAL_SERVOS = ['base', 'femur', 'tibia']  # the servo goals of a pick
+FIT_DEGREE = 2  # the degree of the polynomials fitted to the pick trials
+
+
+class GoalTable(object):
+    """
+    The pick goals of the (base, femur, tibia) servos at every pixel.
+    """
+
+    def __init__(self, table):
+        """
+
+        :param table: int array of shape (height + 1, width + 1, 3) holding
+            the goals of the pick at `table[y, x]`. Both x and y are inclusive
+            of the image width and height, as found objects' y coordinates
+            count up from the bottom of the image.
+        """
+        super(GoalTable, self).__init__()
+        self.table = np.asarray(table, dtype=np.int16)
+
+    @classmethod
+    def from_goals(cls, goals_function, width=MAX_IMAGE_WIDTH,
+                   height=MAX_IMAGE_HEIGHT):
+        """
+        Make the table of a function calculating goals, such as `polar_goals`.
+
+        :param goals_function: function of arrays of x and y coordinates that
+            returns the arrays of the base, femur and tibia goals
+        """
+        x, y = np.meshgrid(np.arange(width + 1), np.arange(height + 1))
+        return cls(np.dstack(goals_function(x, y)))
+
+    @classmethod
+    def load(cls, filename):
+        table = cls(np.load(filename))
+        log.info("[load] goal table:{0} shape:{1}".format(
+            filename, table.table.shape))
+        return table
+
+    def save(self, filename):
+        # np.save adds the .npy extension to file names without it
+        with open(filename, 'wb') as f:
+            np.save(f, self.table)
+        log.info("[save] goal table:{0}".format(filename))
+
+    def goals(self, x, y):
+        """
+        :param x: x coordinate of the pick, clipped to the table
+        :param y: y coordinate of the pick, clipped to the table
+        :return: base, femur, tibia goals
+        """
+        height, width = self.table.shape[:2]
+        x = min(max(int(x), 0), width - 1)
+        y = min(max(int(y), 0), height - 1)
+        base, femur, tibia = self.table[y, x]
+        return int(base), int(femur), int(tibia)
+
+    def goals_of(self, points):
+        """
+        :param points: list of (x, y) coordinates or of dicts with 'x' and 'y'
+        :return: list of the base, femur, tibia goals of the points
+        """
+        return [self.goals(p['x'], p['y']) if isinstance(p, dict) else
+                self.goals(p[0], p[1]) for p in points]
+
+
+def polynomial_terms(x, y, degree):
+    # the terms x^i * y^j with i + j <= degree, as columns
+    x = np.asarray(x, dtype=np.float64).ravel()
+    y = np.asarray(y, dtype=np.float64).ravel()
+    return np.column_stack([x ** (d - j) * y ** j
+                            for d in range(degree + 1)
+                            for j in range(d + 1)])
+
+
+def fit_goal_table(trials, width=MAX_IMAGE_WIDTH, height=MAX_IMAGE_HEIGHT,
+                   degree=FIT_DEGREE):
+    """
+    Fit a polynomial of the pixel coordinates to every servo's goals of the
+    pick trials by least squares, and tabulate the polynomials.
+
+    :param trials: list of dicts with the 'x', 'y' of a picked box and the
+        'base', 'femur', 'tibia' servo positions it was picked with
+    :param degree: the degree of the polynomials. It is lowered when there
+        are too few trials to fit it.
+    :return: the GoalTable of the fitted goals
+    """
+    x = [t['x'] for t in trials]
+    y = [t['y'] for t in trials]
+    while degree > 0 and len(trials) < (degree + 1) * (degree + 2) // 2:
+        degree -= 1
+    if len(trials) < 1:
+        raise ValueError("Cannot fit a goal table without trials")
+
+    terms = polynomial_terms(x, y, degree)
+    goals = np.array([[t[servo] for servo in GOAL_SERVOS] for t in trials],
+                     dtype=np.float64)
+    coefficients, residuals, rank, sv = np.linalg.lstsq(
+        terms, goals, rcond=-1)
+    fitted = terms.dot(coefficients)
+    log.info("[fit_goal_table] trials:{0} degree:{1} rms error:{2}".format(
+        len(trials), degree,
+        np.sqrt(np.mean((fitted - goals) ** 2, axis=0)).round(1)))
+
+    grid_x, grid_y = np.meshgrid(np.arange(width + 1), np.arange(height + 1))
+    table = polynomial_terms(grid_x, grid_y, degree).dot(coefficients)
+    return GoalTable(np.rint(table).reshape(height + 1, width + 1, 3))
+
+
+def goal_table_file(dir_path, device_name):
+    """
+    :return: the file name of the goal table of an arm device
+    """
+    return os.path.join(dir_path, '{0}_goals.npy'.format(device_name))
+
+
+def load_goal_table(filename):
+    """
+    :return: the fitted GoalTable in `filename`, or the table of
+        `polar_goals` if the file does not exist
+    """
+    if os.path.exists(filename):
+        return GoalTable.load(filename)
+
+    log.info("[load_goal_table] no goal table:{0} using polar goals".format(
+        filename))
+    return GoalTable.from_goals(polar_goals)
+
+
+def load_trials(filename):
+    if not os.path.exists(filename):
+        return list()
+    with open(filename) as f:
+        return json.load(f)
+
+
+def record_trial(filename, x, y, base, femur, tibia):
+    trials = load_trials(filename)
+    trials.append({'x': x, 'y': y, 'base': base, 'femur': femur,
+                   'tibia': tibia})
+    with open(filename, 'w') as f:
+        json.dump(trials, f, indent=2, sort_keys=True)
+    log.info("[record_trial] trial:{0} trials:{1}".format(
+        trials[-1], len(trials)))
+
+
+def cli_record(pa):
+    from servo.servode import Servo, ServoProtocol
+    from . import arm_servo_ids
+
+    with ServoProtocol() as sp:
+        base = Servo(sp, arm_servo_ids[0])
+        femur = Servo(sp, arm_servo_ids[1])
+        femur02 = Servo(sp, arm_servo_ids[2])
+        tibia = Servo(sp, arm_servo_ids[3])
+        for servo in (base, femur, femur02, tibia):
+            servo['torque_enable'] = 0
+        raw_input("Move the arm down onto the box at x:{0} y:{1}, then "
+                  "press Enter".format(pa.x, pa.y))
+        record_trial(pa.trials, pa.x, pa.y, base['present_position'],
+                     femur['present_position'], tibia['present_position'])
+
+
+def cli_fit(pa):
+    fit_goal_table(load_trials(pa.trials), degree=pa.degree).save(pa.table)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Camera to arm calibration',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    subparsers = parser.add_subparsers()
+
+    record_parser = subparsers.add_parser(
+        'record',
+        description="Record the arm's position picking a box as a trial.")
+    record_parser.add_argument('trials', help="The trials file.")
+    record_parser.add_argument('x', type=int,
+                               help="The 'X' coordinate the box was found at.")
+    record_parser.add_argument('y', type=int,
+                               help="The 'Y' coordinate the box was found at.")
+    record_parser.set_defaults(func=cli_record)
+
+    fit_parser = subparsers.add_parser(
+        'fit',
+        description='Fit the goal table of the recorded trials.')
+    fit_parser.add_argument('trials', help="The trials file.")
+    fit_parser.add_argument('table', help="The goal table file to write.")
+    fit_parser.add_argument('--degree', default=FIT_DEGREE, type=int,
+                            help="The degree of the fitted polynomials.")
+    fit_parser.set_defaults(func=cli_fit)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You may not
+# use this file except in compliance with the License. A copy of the License is
+# located at
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""
+The end-effector camera of the arm.
+
+The `CameraService` keeps the arm's PiCamera open and warmed up for the life of
+the arm process, so that every `find` attempt only pays for the capture of a
+frame instead of opening the camera and waiting for its exposure to settle.
+
+When streaming, the camera continuously captures from its video port into a
+`FrameRing` so that the freshest frame is always available without waiting
+for a capture.
+
+Frames are captured as raw YUV420 into preallocated buffers that are reused
+for every frame, and their luma (Y) plane is handed out as a view into the
+buffer, so capturing a frame allocates no image memory.
+"""
+import time
+import logging
+import threading
+import numpy as np
+import picamera
+import picamera.array
+
+log = logging.getLogger('camera')
+handler = logging.StreamHandler()
+formatter = logging.Formatter(
+    '%(asctime)s|%(name)-8s|%(levelname)s: %(message)s')
+handler.setFormatter(formatter)
+log.addHandler(handler)
+log.setLevel(logging.INFO)
+
+WARMUP_SECONDS = 2  # time given to the sensor to settle on gain and AWB
+FRAME_RING_SIZE = 3  # frames kept while streaming, at least 3 are needed
+FRAME_TIMEOUT = 1  # seconds to wait for a streamed frame before giving up
+
+
+class FrameSlot(object):
+    """
+    A preallocated raw YUV420 frame that the camera writes into.
+    """
+
+    def __init__(self, size):
+        super(FrameSlot, self).__init__()
+        self.data = np.empty(size, dtype=np.uint8)
+        self.position = 0
+
+    def write(self, buf):
+        # the camera may hand a frame over in several chunks
+        chunk = np.frombuffer(buf, dtype=np.uint8)
+        end = min(self.position + len(chunk), len(self.data))
+        self.data[self.position:end] = chunk[:end - self.position]
+        self.position = end
+        return len(chunk)
+
+    def flush(self):
+        pass
+
+
+class FrameRing(object):
+    """
+    A bounded ring of `FrameSlot`s shared by one writer and one reader.
+
+    The writer never overwrites the latest frame nor the frame the reader is
+    still processing, so the reader always gets a complete frame without any
+    copy.
+    """
+
+    def __init__(self, frame_size, size=FRAME_RING_SIZE):
+        super(FrameRing, self).__init__()
+        if size < 3:
+            raise ValueError("FrameRing size must be at least 3")
+        self.slots = [FrameSlot(frame_size) for _ in range(size)]
+        self.cond = threading.Condition()
+        self.sequence = 0
+        self._latest = None
+        self._reading = None
+        self._next = 0
+
+    def writable(self):
+        """
+        :return: the next FrameSlot the writer may capture into
+        """
+        with self.cond:
+            while self._next in (self._latest, self._reading):
+                self._next = (self._next + 1) % len(self.slots)
+            slot = self.slots[self._next]
+            self._next = (self._next + 1) % len(self.slots)
+        slot.position = 0
+        return slot
+
+    def publish(self, slot):
+        """
+        Make a completely written FrameSlot the latest frame.
+        """
+        with self.cond:
+            self._latest = self.slots.index(slot)
+            self.sequence += 1
+            self.cond.notify_all()
+
+    def read(self, after=0, timeout=FRAME_TIMEOUT):
+        """
+        Get the latest frame once it is newer than the `after` sequence.
+
+        :param after: the sequence number of the last frame read
+        :param timeout: seconds to wait for a newer frame
+        :return: sequence, frame data; or None, None upon timeout
+        """
+        deadline = time.time() + timeout
+        with self.cond:
+            while self.sequence <= after:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None, None
+                self.cond.wait(remaining)
+            self._reading = self._latest
+            return self.sequence, self.slots[self._reading].data
+
+
+class CameraService(object):
+    """
+    A long-lived camera that hands captured frames to an image processor on
+    demand.
+    """
+
+    def __init__(self, resolution=(96, 96), warmup=WARMUP_SECONDS,
+                 streaming=False, exposure=None):
+        """
+
+        :param resolution: the (width, height) of the captured frames
+        :param warmup: seconds to let exposure and white balance settle before
+            they are locked. When 0 the camera is used without locking them.
+        :param streaming: continuously capture from the video port once opened
+        :param exposure: a dict with the 'shutter_speed' and 'awb_gains' to
+            lock after the warmup, e.g. from a calibration profile, instead of
+            the ones the camera settled on
+        """
+        super(CameraService, self).__init__()
+        self.resolution = resolution
+        self.warmup = warmup
+        self.streaming = streaming
+        self.exposure = exposure
+        self.camera = None
+        self.frame = None
+        self.lock = threading.Lock()
+        self.ring = None
+        self._sequence = 0
+        self._should_stream = threading.Event()
+        self._stream_thread = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        """
+        Open the camera and, after the warmup, lock its exposure and white
+        balance so that consecutive frames are captured alike.
+
+        :return: this CameraService
+        """
+        if self.camera is not None:
+            return self
+
+        self.camera = picamera.PiCamera(resolution=self.resolution)
+        self.camera.hflip = True
+        self.camera.vflip = True
+        self.frame = FrameSlot(self._frame_size())
+
+        if self.warmup:
+            # the analog and digital gains can only settle, not be set
+            time.sleep(self.warmup)
+            if self.exposure is None:
+                shutter_speed = self.camera.exposure_speed
+                gains = self.camera.awb_gains
+            else:
+                shutter_speed = self.exposure['shutter_speed']
+                gains = tuple(self.exposure['awb_gains'])
+            self.camera.shutter_speed = shutter_speed
+            self.camera.exposure_mode = 'off'
+            self.camera.awb_mode = 'off'
+            self.camera.awb_gains = gains
+            self.exposure = {
+                'shutter_speed': shutter_speed,
+                'awb_gains': [float(gain) for gain in gains]
+            }
+            log.info("[open] locked shutter_speed:{0} awb_gains:{1}".format(
+                shutter_speed, gains))
+
+        self.camera._set_led(True)
+        if self.streaming:
+            self.start_streaming()
+        return self
+
+    def start_streaming(self, ring_size=FRAME_RING_SIZE):
+        """
+        Start continuously capturing frames from the video port into a
+        FrameRing.
+        """
+        if self._stream_thread is not None:
+            return
+
+        self.ring = FrameRing(self._frame_size(), size=ring_size)
+        self._sequence = 0
+        self._should_stream.set()
+        self._stream_thread = threading.Thread(
+            name="camera_stream_thread", target=self._stream)
+        self._stream_thread.daemon = True
+        self._stream_thread.start()
+        self.streaming = True
+        log.info("[start_streaming] ring_size:{0}".format(ring_size))
+
+    def stop_streaming(self):
+        if self._stream_thread is None:
+            return
+
+        self._should_stream.clear()
+        self._stream_thread.join(FRAME_TIMEOUT * 2)
+        self._stream_thread = None
+        self.streaming = False
+        log.info("[stop_streaming] stopped")
+
+    def _frame_size(self):
+        width, height = picamera.array.raw_resolution(self.resolution)
+        # YUV420 holds a full size Y plane followed by quarter size U and V
+        return width * height * 3 // 2
+
+    def _luma(self, data):
+        # the Y plane is padded to the raw resolution, crop it as a view
+        width, height = self.resolution
+        raw_width, raw_height = picamera.array.raw_resolution(self.resolution)
+        y_plane = data[:raw_width * raw_height].reshape(raw_height, raw_width)
+        return y_plane[:height, :width]
+
+    def _slots(self):
+        # each slot is handed to the camera once the previous one is complete
+        while self._should_stream.is_set():
+            slot = self.ring.writable()
+            yield slot
+            self.ring.publish(slot)
+
+    def _stream(self):
+        self.camera.capture_sequence(
+            self._slots(), 'yuv', use_video_port=True)
+
+    def capture(self):
+        """
+        Capture a frame from the camera. When streaming, the freshest frame
+        not yet returned is used instead of capturing a new one.
+
+        :return: the frame's luma (Y) plane as a (height, width) view, or None
+            if no streamed frame arrived in time. The view is only valid until
+            the next capture.
+        """
+        if self.streaming:
+            sequence, data = self.ring.read(after=self._sequence)
+            if sequence is None:
+                log.warning("[capture] no streamed frame in {0}s".format(
+                    FRAME_TIMEOUT))
+                return None
+            self._sequence = sequence
+            return self._luma(data)
+
+        with self.lock:
+            self.frame.position = 0
+            self.camera.capture(self.frame, 'yuv')
+            return self._luma(self.frame.data)
+
+    def close(self):
+        if self.camera is None:
+            return
+
+        self.stop_streaming()
+        log.info("[close] closing camera")
+        self.camera.close()
+        self.camera = None
+        self.frame = None
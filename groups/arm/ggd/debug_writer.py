@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You may not
+# use this file except in compliance with the License. A copy of the License is
+# located at
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""
+Background writer of the debug images produced while finding objects.
+
+Writing PNGs to the SD card of the Pi is slow, so the `DebugImageWriter` takes
+the images off the find path and writes them from its own thread. When images
+arrive faster than they can be written the oldest queued images are dropped.
+"""
+import logging
+import threading
+import collections
+import numpy as np
+import png
+
+log = logging.getLogger('debug_writer')
+handler = logging.StreamHandler()
+formatter = logging.Formatter(
+    '%(asctime)s|%(name)-8s|%(levelname)s: %(message)s')
+handler.setFormatter(formatter)
+log.addHandler(handler)
+log.setLevel(logging.INFO)
+
+DEBUG_QUEUE_SIZE = 14  # images waiting to be written, two frames worth
+
+
+def write_png(name, rows):
+    """
+    Write a greyscale PNG.
+
+    :param name: the file name of the PNG
+    :param rows: 2D array of the greyscale values of the image
+    :return: the file name of the PNG
+    """
+    rows = np.asarray(rows, dtype=np.uint8)
+    height, width = rows.shape
+    with open(name, 'wb') as f:
+        w = png.Writer(width, height, greyscale=True)
+        w.write(f, rows.tolist())
+    return name
+
+
+class DebugImageWriter(threading.Thread):
+    """
+    Thread that writes queued debug images as PNGs.
+    """
+
+    def __init__(self, max_queued=DEBUG_QUEUE_SIZE):
+        super(DebugImageWriter, self).__init__(name="debug_writer_thread")
+        self.daemon = True
+        self.queue = collections.deque(maxlen=max_queued)
+        self.cond = threading.Condition()
+        self.should_run = True
+        self.dropped = 0
+
+    def put(self, name, rows):
+        """
+        Queue an image to be written. A copy of `rows` is queued, so the
+        caller may reuse its buffers right away.
+
+        :param name: the file name of the PNG
+        :param rows: 2D array of the greyscale values of the image
+        """
+        with self.cond:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+                log.debug("[put] queue full, dropped oldest image:{0}".format(
+                    self.queue[0][0]))
+            self.queue.append((name, np.array(rows, dtype=np.uint8)))
+            self.cond.notify()
+
+    def stop(self):
+        """
+        Write the images still queued and stop the thread.
+        """
+        with self.cond:
+            self.should_run = False
+            self.cond.notify()
+        if self.is_alive():
+            self.join()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while self.should_run and not self.queue:
+                    self.cond.wait()
+                if not self.queue:
+                    break
+                name, rows = self.queue.popleft()
+
+            try:
+                write_png(name, rows)
+            except IOError as ioe:
+                log.error("[run] could not write:{0} error:{1}".format(
+                    name, ioe))
@@ -1,303 +1,813 @@
-import picamera
-import picamera.array
-import png
-import math
+import numpy as np
+from debug_writer import DebugImageWriter
 from pixel_object import PixelObject
 
 """
 Image processor that can find the edges in a PNG image captured by a PiCamera.
 """
 
+DEBUG_OFF = 'off'  # never write debug images
+DEBUG_ON_DETECT = 'detect'  # write a frame's images when it has an object
+DEBUG_SAMPLED = 'sample'  # write the images of one in `debug_sample` frames
+DEBUG_ALL = 'all'  # write the images of every frame
+DEBUG_POLICIES = [DEBUG_OFF, DEBUG_ON_DETECT, DEBUG_SAMPLED, DEBUG_ALL]
+ROI_PADDING = 12  # pixels searched around the last object when tracking
+PYRAMID_FACTOR = 2  # frames are detected coarse at 1/2 the frame size
+EDGE_THRESHOLD = 18  # edges at least this strong are white
+MIN_EDGE_THRESHOLD = 10  # adaptive thresholds never go below this
+THRESHOLD_FIXED = 'fixed'  # use the same threshold for every frame
+THRESHOLD_OTSU = 'otsu'  # split every frame's edge histogram with Otsu
+THRESHOLD_PERCENTILE = 'percentile'  # keep a percentile of the edges
+THRESHOLD_MODES = [THRESHOLD_FIXED, THRESHOLD_OTSU, THRESHOLD_PERCENTILE]
+BACKGROUND_RATE = 0.05  # share of an empty frame blended into the background
+BACKGROUND_THRESHOLD = 15  # luma change that makes a pixel foreground
+BACKGROUND_FRAMES = 5  # empty frames averaged before the background is used
+SIMILAR_FRAME_FACTOR = 8  # frames are compared shrunk by 1/8 of their size
+MORPH_OPEN = 'open'  # cut spurs thinner than the structuring element
+MORPH_CLOSE = 'close'  # fill gaps smaller than the structuring element
+MORPH_OPERATIONS = [None, MORPH_OPEN, MORPH_CLOSE]
+# structuring elements for the morphological operations
+SQUARE = np.ones((3, 3), dtype=bool)
+# the neighbours white pixels have always been spread to: the row above and
+# the pixel to the left. Detection sizes such as the stages' MIN_OBJECT_SIZE
+# are tuned against it.
+SPREAD = np.array([[1, 1, 1],
+                   [1, 1, 0],
+                   [0, 0, 0]], dtype=bool)
+CROSS = np.array([[0, 1, 0],
+                  [1, 1, 1],
+                  [0, 1, 0]], dtype=bool)
+
+
+def _combine_shifted(bw, structure, reflect, dilation):
+    # OR (dilation) or AND (erosion) together a copy of the image shifted by
+    # every offset of the structuring element
+    bw = np.asarray(bw) > 0
+    structure = np.asarray(structure, dtype=bool)
+    height, width = bw.shape
+    s_height, s_width = structure.shape
+    if reflect:
+        structure = structure[::-1, ::-1]
+    pad_y, pad_x = s_height // 2, s_width // 2
+    padded = np.zeros((height + s_height - 1, width + s_width - 1),
+                      dtype=bool)
+    padded[pad_y:pad_y + height, pad_x:pad_x + width] = bw
+
+    out = np.zeros(bw.shape, dtype=bool) if dilation else \
+        np.ones(bw.shape, dtype=bool)
+    for dy, dx in zip(*np.nonzero(structure)):
+        window = padded[dy:dy + height, dx:dx + width]
+        if dilation:
+            out |= window
+        else:
+            out &= window
+    return out
+
+
+def dilate(bw, structure=SQUARE, iterations=1):
+    """
+    Grow the white pixels of a black and white image by the structuring
+    element.
+
+    :param bw: 2D array in which white pixels are non-zero
+    :param structure: 2D boolean array with odd sides, centred on the pixel
+    :param iterations: how many times to dilate
+    :return: 2D boolean array of the dilated image
+    """
+    out = np.asarray(bw) > 0
+    for _ in range(iterations):
+        out = _combine_shifted(out, structure, reflect=True, dilation=True)
+    return out
+
+
+def erode(bw, structure=SQUARE, iterations=1):
+    """
+    Shrink the white pixels of a black and white image by the structuring
+    element. Pixels beyond the image border count as black.
+
+    :param bw: 2D array in which white pixels are non-zero
+    :param structure: 2D boolean array with odd sides, centred on the pixel
+    :param iterations: how many times to erode
+    :return: 2D boolean array of the eroded image
+    """
+    out = np.asarray(bw) > 0
+    for _ in range(iterations):
+        out = _combine_shifted(out, structure, reflect=False, dilation=False)
+    return out
+
+
+def opening(bw, structure=SQUARE, iterations=1):
+    # erode then dilate, removing white specks the structure does not fit in
+    return dilate(erode(bw, structure, iterations), structure, iterations)
+
+
+def closing(bw, structure=SQUARE, iterations=1):
+    # dilate then erode, filling black gaps the structure does not fit in
+    return erode(dilate(bw, structure, iterations), structure, iterations)
+
+
+def downsample(rows, factor):
+    """
+    Shrink an image by averaging every `factor` x `factor` block of pixels.
+    Pixels past the last whole block are dropped.
+
+    :param rows: 2D array of greyscale values
+    :param factor: the integer shrink factor
+    :return: 2D uint8 array of the shrunk image
+    """
+    rows = np.asarray(rows)
+    height, width = rows.shape[0] // factor, rows.shape[1] // factor
+    blocks = rows[:height * factor, :width * factor].reshape(
+        height, factor, width, factor)
+    return np.rint(blocks.mean(axis=(1, 3))).astype(np.uint8)
+
+
+def horizontal_edges(raw_rows):
+    # horizontal edges, the last column repeats its left neighbour
+    raw = np.asarray(raw_rows, dtype=np.int16)
+    rows = np.empty(raw.shape, dtype=np.uint8)
+    rows[:, :-1] = np.abs(raw[:, :-1] - raw[:, 1:])
+    rows[:, -1] = rows[:, -2]
+    return rows
+
+
+def vertical_edges(raw_rows):
+    # vertical edges, the last row repeats the row above it
+    raw = np.asarray(raw_rows, dtype=np.int16)
+    rows = np.empty(raw.shape, dtype=np.uint8)
+    rows[:-1, :] = np.abs(raw[:-1, :] - raw[1:, :])
+    rows[-1, :] = rows[-2, :]
+    return rows
+
+
+def fuse_edges(hrows, vrows):
+    # fuse the horizontal edge-image with the vertical edge-image
+    fused = np.rint(np.hypot(np.asarray(hrows, dtype=np.float64),
+                             np.asarray(vrows, dtype=np.float64)))
+    return np.minimum(fused, 255).astype(np.uint8)
+
+
+def edges(raw_rows):
+    """
+    :param raw_rows: 2D array of luma values
+    :return: 2D uint8 array of the fused edge strengths of the image
+    """
+    return fuse_edges(horizontal_edges(raw_rows), vertical_edges(raw_rows))
+
+
+def otsu_threshold(rows):
+    """
+    Find the threshold that best splits a greyscale image in two classes, by
+    maximising the variance between the classes (Otsu's method).
+
+    :param rows: 2D uint8 array
+    :return: the threshold, values at least this large are in the upper class
+    """
+    hist = np.bincount(np.asarray(rows, dtype=np.uint8).ravel(),
+                       minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    weight_low = np.cumsum(hist)
+    weight_high = weight_low[-1] - weight_low
+    sum_low = np.cumsum(hist * levels)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_low = sum_low / weight_low
+        mean_high = (sum_low[-1] - sum_low) / weight_high
+        between = weight_low * weight_high * (mean_low - mean_high) ** 2
+    between[np.isnan(between)] = 0
+    return int(np.argmax(between)) + 1
+
+
+def percentile_threshold(rows, percentile):
+    """
+    :param rows: 2D uint8 array
+    :param percentile: the percentage of values that fall below the threshold
+    :return: the threshold, values at least this large are above `percentile`
+    """
+    return int(np.ceil(np.percentile(rows, percentile)))
+
+
+class BackgroundModel(object):
+    """
+    A running average of the frames of the empty scene, e.g. of the belt
+    without boxes, that tells which pixels of a frame changed.
+    """
+
+    def __init__(self, rate=BACKGROUND_RATE, threshold=BACKGROUND_THRESHOLD,
+                 min_frames=BACKGROUND_FRAMES):
+        """
+
+        :param rate: the share of every new empty frame blended into the
+            average, once `min_frames` frames have been averaged
+        :param threshold: how much a pixel's luma must differ from the average
+            to be foreground
+        :param min_frames: how many empty frames must be averaged before the
+            background is used
+        """
+        super(BackgroundModel, self).__init__()
+        self.rate = rate
+        self.threshold = threshold
+        self.min_frames = min_frames
+        self.mean = None
+        self.frame_count = 0
+
+    @property
+    def ready(self):
+        return self.frame_count >= self.min_frames
+
+    def reset(self):
+        self.mean = None
+        self.frame_count = 0
+
+    def update(self, rows):
+        """
+        Blend a frame of the empty scene into the background.
+
+        :param rows: 2D array of the frame's luma values
+        """
+        rows = np.asarray(rows, dtype=np.float32)
+        if self.mean is None or self.mean.shape != rows.shape:
+            self.mean = rows.copy()
+            self.frame_count = 1
+            return
+
+        self.frame_count += 1
+        # a plain average until ready, so the first frame does not dominate
+        rate = max(self.rate, 1.0 / self.frame_count)
+        self.mean += rate * (rows - self.mean)
+
+    def foreground(self, rows):
+        """
+        :param rows: 2D array of the frame's luma values
+        :return: 2D boolean array of the pixels that differ from the
+            background, or None when the background is not ready
+        """
+        if not self.ready or self.mean.shape != np.shape(rows):
+            return None
+        return np.abs(rows - self.mean) >= self.threshold
+
+
+def label_pixel_objects(bw_rows, offset=(0, 0)):
+    """
+    Label the 8-connected objects of white pixels in a black and white image.
+
+    Runs of white pixels are found in every row and joined to the touching
+    runs of the previous row with a union-find, which makes the labelling a
+    single pass that is linear in the number of runs.
+
+    :param bw_rows: 2D array in which white pixels are non-zero
+    :param offset: the (x, y) position of `bw_rows` within the frame, added
+        to the coordinates of the objects' pixels
+    :return: labels, pixel_objects
+        labels - int32 array holding each pixel's object label, 0 if black
+        pixel_objects - the PixelObject of every label, in label order
+    """
+    bw = np.asarray(bw_rows) > 0
+    height, width = bw.shape
+    labels = np.zeros((height, width), dtype=np.int32)
+
+    # a run starts where a row steps from black to white and ends (exclusive)
+    # where it steps back to black
+    padded = np.zeros((height, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = bw
+    steps = np.diff(padded, axis=1)
+    run_y, run_start = np.nonzero(steps == 1)
+    run_end = np.nonzero(steps == -1)[1]
+    if len(run_y) == 0:
+        return labels, []
+
+    parent = list(range(len(run_y)))
+
+    def find(r):
+        while parent[r] != r:
+            parent[r] = parent[parent[r]]
+            r = parent[r]
+        return r
+
+    # plain lists index much faster than arrays inside the Python loop
+    starts = run_start.tolist()
+    ends = run_end.tolist()
+    row_first = np.searchsorted(run_y, np.arange(height + 1)).tolist()
+    for y in range(1, height):
+        prev = row_first[y - 1]
+        prev_last = row_first[y]
+        for r in range(row_first[y], row_first[y + 1]):
+            # skip previous row runs that end left of this run's neighbours
+            while prev < prev_last and ends[prev] < starts[r]:
+                prev += 1
+            p = prev
+            while p < prev_last and starts[p] <= ends[r]:
+                root_p, root_r = find(p), find(r)
+                if root_p != root_r:
+                    parent[max(root_p, root_r)] = min(root_p, root_r)
+                p += 1
+
+    # the root of every object is its first run in raster order
+    off_x, off_y = offset
+    pixel_objects = []
+    root_objects = dict()
+    for r, y in enumerate(run_y.tolist()):
+        root = find(r)
+        if root not in root_objects:
+            root_objects[root] = PixelObject(len(pixel_objects) + 1)
+            pixel_objects.append(root_objects[root])
+        obj = root_objects[root]
+        obj.add_run(y + off_y, starts[r] + off_x, ends[r] + off_x)
+        labels[y, starts[r]:ends[r]] = obj.id_
+
+    return labels, pixel_objects
+
 
 class ImageProcessor:
 
-    def __init__(self, res_width=96, res_height=96):
-        self.camera = picamera.PiCamera(resolution=(res_width, res_height))
-        # TODO propagate configurable resolution through '96' logic below
+    def __init__(self, res_width=96, res_height=96, camera=None,
+                 debug=DEBUG_ALL, debug_sample=10, min_object_size=0,
+                 debug_writer=None, track=False, roi_padding=ROI_PADDING,
+                 structure=SPREAD, spread=1, morphology=None, pyramid=False,
+                 pyramid_factor=PYRAMID_FACTOR, threshold=EDGE_THRESHOLD,
+                 threshold_mode=THRESHOLD_FIXED, threshold_percentile=95,
+                 min_threshold=MIN_EDGE_THRESHOLD, background=None,
+                 similar_frame_diff=None):
+        """
 
-        self.camera.hflip = True
-        self.camera.vflip = True
+        :param res_width: the width of the frames to process
+        :param res_height: the height of the frames to process
+        :param camera: a `CameraService` shared with other users. If None, the
+            ImageProcessor opens its own camera and closes it in `close()`.
+        :param debug: the policy deciding which frames have their debug images
+            written, one of `DEBUG_POLICIES`
+        :param debug_sample: with the `DEBUG_SAMPLED` policy, write the debug
+            images of one in this many frames
+        :param min_object_size: objects larger than this are detections. The
+            `DEBUG_ON_DETECT` policy and tracking use it.
+        :param debug_writer: a `DebugImageWriter` shared with other users. If
+            None, the ImageProcessor starts its own and stops it in `close()`.
+        :param track: first search a region of interest around the last
+            detected object, falling back to the full frame when nothing is
+            found in it
+        :param roi_padding: pixels added around the last detected object's
+            bounding box to make the region of interest
+        :param structure: the structuring element used to spread white pixels
+            and by the `morphology` operation
+        :param spread: how many times white pixels are spread by `structure`
+        :param morphology: None, or one of `MORPH_OPEN` or `MORPH_CLOSE` to
+            smooth the black and white image after spreading it. Opening cuts
+            the thin spurs and bridges the spread leaves, closing fills its
+            narrow gaps.
+        :param pyramid: detect objects in a frame shrunk by `pyramid_factor`
+            first, then only search the full resolution frame around the
+            objects found. Faster, but objects too small to survive the
+            shrink are missed.
+        :param pyramid_factor: the integer factor frames are shrunk by for
+            the coarse detection
+        :param threshold: the edge strength at which an edge pixel becomes
+            white with the `THRESHOLD_FIXED` mode, e.g. from a calibration
+            profile
+        :param threshold_mode: how the threshold of a frame is chosen, one of
+            `THRESHOLD_MODES`
+        :param threshold_percentile: with the `THRESHOLD_PERCENTILE` mode,
+            the percentage of a frame's edge pixels that stay black
+        :param min_threshold: the lowest threshold the adaptive modes use, so
+            a frame of sensor noise does not turn white
+        :param background: a `BackgroundModel` that learns the first frames,
+            which must show the empty scene, and after that the frames in
+            which nothing is detected. Once it is ready only the edges of
+            pixels that differ from the background are segmented.
+        :param similar_frame_diff: when no pixel of a frame shrunk by
+            `SIMILAR_FRAME_FACTOR` differs by this much luma from the last
+            processed frame, the frame is not processed and the last frame's
+            results are kept. Shrinking averages the sensor noise away while
+            an object still changes the pixels it covers. None processes every
+            frame.
+        """
+        if debug not in DEBUG_POLICIES:
+            raise ValueError("Unknown debug policy:{0}".format(debug))
+        if morphology not in MORPH_OPERATIONS:
+            raise ValueError("Unknown morphology:{0}".format(morphology))
+        if threshold_mode not in THRESHOLD_MODES:
+            raise ValueError("Unknown threshold mode:{0}".format(
+                threshold_mode))
+        self._own_camera = camera is None
+        if self._own_camera:
+            # imported here so frames can be processed where there is no
+            # PiCamera, e.g. by the vision bench
+            from camera import CameraService
+            camera = CameraService(
+                resolution=(res_width, res_height), warmup=0).open()
+        self.camera = camera
+        self.debug = debug
+        self.debug_sample = debug_sample
+        self.min_object_size = min_object_size
+        self._own_debug_writer = debug_writer is None
+        if self._own_debug_writer:
+            debug_writer = DebugImageWriter()
+            debug_writer.start()
+        self.debug_writer = debug_writer
+        self._debug_images = []
+        self.frame_count = 0
+        self.track = track
+        self.roi_padding = roi_padding
+        self.roi = None
+        self.structure = structure
+        self.spread = spread
+        self.morphology = morphology
+        self.pyramid = pyramid
+        self.pyramid_factor = pyramid_factor
+        self.threshold = threshold
+        self.threshold_mode = threshold_mode
+        self.threshold_percentile = threshold_percentile
+        self.min_threshold = min_threshold
+        self.frame_threshold = threshold
+        self.background = background
+        self.similar_frame_diff = similar_frame_diff
+        self._last_thumbnail = None
+        self.frame_reused = False
+        self.offset = (0, 0)
+        self.frame_shape = (res_height, res_width)
         self.res_width = res_width
         self.res_height = res_height
-        self.stream = picamera.array.PiYUVArray(self.camera)
-        self.pixelObjList = []
-        self.object_id_center = 0
-        self.pixelObjList.append(PixelObject(self.next_obj_id()))
-        self.max_pixel_count = 0
-        self.largest_object_id = 0
-        self.largest_X = 0
-        self.largest_Y = 0
+        self.clear_objects()
         self.filename = ''
 
     def close(self):
         print('[ImageProcessor.close] flushing')
+        self.clear_objects()
+        self.roi = None
+        self._last_thumbnail = None
+        if self._own_camera:
+            self.camera.close()
+        if self._own_debug_writer:
+            self.debug_writer.stop()
+
+    def clear_objects(self):
+        self.labels = np.zeros(self.frame_shape, dtype=np.int32)
         self.pixelObjList = []
-        self.object_id_center = 0
         self.max_pixel_count = 0
         self.largest_object_id = 0
         self.largest_X = 0
         self.largest_Y = 0
-        self.camera.close()
+        self.largest_bbox = None
+        self.candidates = []
 
-    def next_obj_id(self):
-        self.object_id_center += 1
-        return self.object_id_center
-
-    def capture_frame(self):
-        self.stream = picamera.array.PiYUVArray(self.camera)
-        self.camera.capture(self.stream, 'yuv')
-        self.camera._set_led(True)
+    def capture_frame(self, roi=None):
+        """
+        Capture a frame and find the objects in it.
 
-        self.pixelObjList = []
-        self.object_id_center = 0
-        self.pixelObjList.append(PixelObject(self.next_obj_id()))
+        :param roi: (x0, y0, x1, y1) region of the frame to search alone, see
+            `search_region`. If None, the whole frame is processed.
+        """
+        luma = self.camera.capture()
+        if luma is None:
+            # no frame arrived in time so there is nothing to be found, and
+            # the last frame's objects must not be mistaken for this one's
+            self.clear_objects()
+            self.frame_reused = False
+            return
+
+        # flip image horizontally and vertically, as a view into the frame
+        self.process_frame(luma[::-1, ::-1], roi=roi)
+
+    def process_frame(self, rows, roi=None):
+        """
+        Find the objects in a frame's luma rows.
 
-        rows = []
-        for _ in range(self.res_height):
-            rows.append(range(self.res_width))
+        :param rows: 2D array of the frame's luma (Y) values
+        :param roi: (x0, y0, x1, y1) region of the frame to search alone, see
+            `search_region`. If None, the whole frame is processed.
+        """
+        self.frame_count += 1
+        if roi is not None:
+            self.search_region(rows, roi)
+            return
+
+        self.frame_reused = self.is_similar_frame(rows)
+        if self.frame_reused:
+            # the scene has not changed, neither would the results, but an
+            # unchanged empty scene still teaches the background
+            if self.background is not None:
+                self.learn_background(rows, not self.background.ready)
+            return
+
+        self.frame_shape = rows.shape
+        self.filename = self.save_PNG('raw.png', rows)
 
-        # flip image horizontally
-        for j, j_ in enumerate(range(self.res_width-1, -1, -1)):
-            # now flip vertically
-            for i, i_ in enumerate(range(self.res_height-1, -1, -1)):
-                rows[j][i] = self.stream.array[j_][i_][0]
+        mask = self.foreground_mask(rows)
+
+        found = False
+        if self.track and self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            self.find_objects(
+                rows[y0:y1, x0:x1], offset=(x0, y0),
+                mask=None if mask is None else mask[y0:y1, x0:x1])
+            found = self.max_pixel_count > self.min_object_size
+            if not found:
+                # only keep the raw image of the region of interest search
+                del self._debug_images[1:]
+        if not found and self.pyramid:
+            found = self.find_pyramid(rows, mask=mask)
+        elif not found:
+            self.find_objects(rows, mask=mask)
+
+        if self.background is not None:
+            self.learn_background(rows, mask is None)
+        self.update_roi()
+        self.write_debug_images()
+
+    def learn_background(self, rows, learning):
+        """
+        Teach the background a frame. The first frames are learnt as they
+        are, later frames only when nothing was detected in them as they show
+        the empty scene.
 
+        :param rows: 2D array of the frame's luma values
+        :param learning: True while the background has no foreground mask
+        """
+        if learning or self.max_pixel_count <= self.min_object_size:
+            ready = self.background.ready
+            self.background.update(rows)
+            if self.background.ready and not ready:
+                # the results of a reused frame were found without the
+                # foreground mask, so the next frame is processed with it
+                self._last_thumbnail = None
+
+    def search_region(self, rows, roi):
+        """
+        Find the objects in a region of a frame only, such as to confirm that
+        a candidate found in an earlier frame is still there. The region
+        search neither tracks nor teaches the background, as its results are
+        not those of the whole frame, and the next frame is fully processed.
+
+        :param rows: 2D array of the frame's luma values
+        :param roi: (x0, y0, x1, y1) region of the frame to search, clipped to
+            the frame
+        """
+        self.frame_reused = False
+        self._last_thumbnail = None
+        self.frame_shape = rows.shape
         self.filename = self.save_PNG('raw.png', rows)
-        self.spread_white_pixels(
-            self.make_black_and_white(
-                self.fuse_horizontal_and_vertical(
-                    self.get_horizontal_edges(rows),
-                    self.get_vertical_edges(rows)))
-        )
 
-    def get_horizontal_edges(self, raw_rows):
-        # get horizontal edges
-        rows = []
-        for _ in range(96):
-            rows.append(range(96))
-        for j in range(96):
-            for i in range(96):
-                if i + 1 <= 95:
-                    rows[j][i] = self.difference(raw_rows[j][i],
-                                                 raw_rows[j][i + 1])
-                else:
-                    rows[j][i] = self.difference(raw_rows[j][i],
-                                                 raw_rows[j][i - 1])
+        height, width = rows.shape
+        x0, y0 = max(roi[0], 0), max(roi[1], 0)
+        x1, y1 = min(roi[2], width), min(roi[3], height)
+        if x1 <= x0 or y1 <= y0:
+            # the region lies outside the frame
+            self.clear_objects()
+            self.write_debug_images()
+            return
+
+        mask = self.foreground_mask(rows)
+        self.find_objects(
+            rows[y0:y1, x0:x1], offset=(x0, y0),
+            mask=None if mask is None else mask[y0:y1, x0:x1])
+        self.write_debug_images()
+
+    def foreground_mask(self, rows):
+        """
+        :return: 2D boolean array of the pixels that differ from the
+            background, grown to include the edges around them, or None
+            without a ready background
+        """
+        if self.background is None:
+            return None
+        mask = self.background.foreground(rows)
+        if mask is not None:
+            # grow the changed pixels to include the edges around them
+            mask = dilate(mask, SQUARE)
+        return mask
+
+    def is_similar_frame(self, rows):
+        """
+        Compare a frame with the last processed frame, and remember it as the
+        last processed frame unless they are similar.
+
+        :param rows: 2D array of the frame's luma values
+        :return: True if the frames are similar
+        """
+        if self.similar_frame_diff is None:
+            return False
 
+        thumbnail = downsample(rows, SIMILAR_FRAME_FACTOR).astype(np.int16)
+        last = self._last_thumbnail
+        if last is not None and last.shape == thumbnail.shape and \
+                np.max(np.abs(thumbnail - last)) < self.similar_frame_diff:
+            return True
+
+        self._last_thumbnail = thumbnail
+        return False
+
+    def find_objects(self, rows, offset=(0, 0), mask=None):
+        """
+        Find the objects in all or part of a frame.
+
+        :param rows: 2D array of luma values to search
+        :param offset: the (x, y) position of `rows` within the frame
+        :param mask: 2D boolean array of the pixels of `rows` to segment, or
+            None to segment them all
+        """
+        self.offset = offset
+        if mask is not None and not mask.any():
+            # nothing differs from the background, so there is nothing to find
+            self.clear_objects()
+            return
+
+        bw_rows = self.make_black_and_white(
+            self.fuse_horizontal_and_vertical(
+                self.get_horizontal_edges(rows),
+                self.get_vertical_edges(rows)))
+        if mask is not None:
+            bw_rows[~mask] = 0
+        self.spread_white_pixels(bw_rows)
+
+    def find_pyramid(self, rows, mask=None):
+        """
+        Find the objects of a frame shrunk by `pyramid_factor`, then refine
+        them by searching the full resolution frame around them.
+
+        :param rows: 2D array of the frame's luma values
+        :param mask: 2D boolean array of the pixels of `rows` to segment, or
+            None to segment them all
+        :return: True if an object larger than `min_object_size` was found
+        """
+        factor = self.pyramid_factor
+        coarse_mask = None
+        if mask is not None:
+            # a coarse pixel is segmented if any of its pixels is
+            coarse_mask = downsample(mask * 255, factor) > 0
+        debug_count = len(self._debug_images)
+        self.find_objects(downsample(rows, factor), mask=coarse_mask)
+        # only keep the debug images of the full resolution search
+        del self._debug_images[debug_count:]
+
+        # an object's pixel count shrinks by the square of the factor
+        min_size = self.min_object_size // (factor * factor)
+        boxes = [obj.bbox for obj in self.pixelObjList
+                 if obj.count_pixel() > min_size]
+        if not boxes:
+            # the coarse objects are too small to be refined into detections
+            self.clear_objects()
+            return False
+
+        # search the padded region around all coarse candidates at once
+        height, width = rows.shape
+        x0 = max(min(b[0] for b in boxes) * factor - self.roi_padding, 0)
+        y0 = max(min(b[1] for b in boxes) * factor - self.roi_padding, 0)
+        x1 = min(max(b[2] for b in boxes) * factor + self.roi_padding, width)
+        y1 = min(max(b[3] for b in boxes) * factor + self.roi_padding, height)
+        self.find_objects(
+            rows[y0:y1, x0:x1], offset=(x0, y0),
+            mask=None if mask is None else mask[y0:y1, x0:x1])
+        return self.max_pixel_count > self.min_object_size
+
+    def update_roi(self):
+        """
+        Make the padded bounding box of the detected object the region of
+        interest of the next frame, or forget it when nothing was detected.
+        """
+        if not self.track or self.max_pixel_count <= self.min_object_size:
+            self.roi = None
+            return
+
+        height, width = self.frame_shape
+        x0, y0, x1, y1 = self.largest_bbox
+        self.roi = (max(x0 - self.roi_padding, 0),
+                    max(y0 - self.roi_padding, 0),
+                    min(x1 + self.roi_padding, width),
+                    min(y1 + self.roi_padding, height))
+
+    def write_debug_images(self):
+        """
+        Hand the frame's debug images to the debug writer if the debug policy
+        wants them written.
+        """
+        if self.debug == DEBUG_ALL:
+            wanted = True
+        elif self.debug == DEBUG_ON_DETECT:
+            wanted = self.max_pixel_count > self.min_object_size
+        elif self.debug == DEBUG_SAMPLED:
+            wanted = self.frame_count % self.debug_sample == 0
+        else:
+            wanted = False
+
+        if wanted:
+            for name, rows in self._debug_images:
+                self.debug_writer.put(name, rows)
+        self._debug_images = []
+
+    def get_horizontal_edges(self, raw_rows):
+        rows = horizontal_edges(raw_rows)
         self.save_PNG('processed_1.png', rows)
         return rows
 
-    def get_vertical_edges(self, rawrows):
-        # get vertical edges
-        rows = []
-        for _ in range(96):
-            rows.append(range(96))
-        for j in range(96):
-            for i in range(96):
-                if j + 1 <= 95:
-                    rows[j][i] = self.difference(
-                        rawrows[j][i], rawrows[j + 1][i])
-                else:
-                    rows[j][i] = self.difference(
-                        rawrows[j][i], rawrows[j - 1][i])
-
+    def get_vertical_edges(self, raw_rows):
+        rows = vertical_edges(raw_rows)
         self.save_PNG('processed_2.png', rows)
         return rows
 
     def fuse_horizontal_and_vertical(self, hrows, vrows):
-        # fuse the horizontal edge-image with the vertical edge-image
-        rows = []
-        for _ in range(96):
-            rows.append(range(96))
-        for j in range(96):
-            for i in range(96):
-                rows[j][i] = self.fusion(hrows[j][i], vrows[j][i])
-
+        rows = fuse_edges(hrows, vrows)
         self.save_PNG('processed_3.png', rows)
         return rows
 
-    def make_black_and_white(self, edge_rows):
+    def edge_threshold(self, edge_rows):
+        """
+        :param edge_rows: 2D array of fused edge strengths
+        :return: the threshold of the edges according to the threshold mode
+        """
+        if self.threshold_mode == THRESHOLD_OTSU:
+            return max(otsu_threshold(edge_rows), self.min_threshold)
+        elif self.threshold_mode == THRESHOLD_PERCENTILE:
+            return max(percentile_threshold(
+                edge_rows, self.threshold_percentile), self.min_threshold)
+        return self.threshold
+
+    def make_black_and_white(self, edge_rows, threshold=None):
         # make the image dual in color (black and white)
-        threshold = 18
-
-        rows = []
-        for _ in range(96):
-            rows.append(range(96))
-        for j in range(96):
-            for i in range(96):
-                if edge_rows[j][i] >= threshold:
-                    rows[j][i] = 255
-                else:
-                    rows[j][i] = 0
+        if threshold is None:
+            threshold = self.edge_threshold(edge_rows)
+        self.frame_threshold = threshold
+        rows = np.where(edge_rows >= threshold, 255, 0).astype(np.uint8)
 
         self.save_PNG('processed_4.png', rows)
         return rows
 
     def spread_white_pixels(self, bw_rows):
-        # make all the white pixels spread out one more pixel
-        rows = []
-        for _ in range(96):
-            rows.append(range(96))
-        for j in range(96):
-            for i in range(96):
-                if bw_rows[j][i] == 255:
-                    tmp_list = self.neighbors((i, j), 96, 96)
-                    for ent in tmp_list:
-                        tmp_x, tmp_y = ent
-                        rows[tmp_y][tmp_x] = 255
-                else:
-                    rows[j][i] = 0
+        # make all the white pixels spread out by the structuring element
+        bw = dilate(np.asarray(bw_rows) > 0, self.structure, self.spread)
+        # the edges are only a pixel wide until they are spread, so the
+        # morphology acts on the spread image
+        if self.morphology == MORPH_OPEN:
+            bw = opening(bw, self.structure)
+        elif self.morphology == MORPH_CLOSE:
+            bw = closing(bw, self.structure)
+        rows = np.where(bw, 255, 0).astype(np.uint8)
 
         self.save_PNG('processed_4_5.png', rows)
 
         self.identify_pixel_objects(rows)
 
     def identify_pixel_objects(self, bw_rows):
-        # make PixelObjects when pixels are direct 8-neighbours of each other
-        for j in range(96):
-            for i in range(96):
-                if bw_rows[j][i] == 255:  # if the pixel is white
-                    tmp_list = []
-                    for ent in self.neighbors((i, j), 96, 96):
-                        tmp_x, tmp_y = ent
-                        if bw_rows[tmp_y][tmp_x] == 255:  # if pixel is white
-                            tmp_list.append(ent)
-                    # print tmp_list
-                    flag = False
-                    for obj in self.pixelObjList:
-                        # make a new PixelObj whenever a Pixel isn't connected
-                        # to an object
-                        if obj.check_xy_set(tmp_list) is True:
-                            flag = True
-                    if flag is False:
-                        self.pixelObjList.append(
-                            PixelObject(self.next_obj_id()))
-                        for obj in self.pixelObjList:
-                            obj.check_xy_set(tmp_list)
-        for obj in self.pixelObjList:
-            rows = []
-            for _ in range(96):
-                rows.append(range(96))
-            for j in range(96):
-                for i in range(96):
-                    if (i, j) in obj.XYset:
-                        rows[j][i] = 255
-                    else:
-                        rows[j][i] = 0
-                        # self.save_PNG(string.join([str(obj.id_), 'processed_5.png'], ''), rows)
-        self.merge_overlapping_pixel_objects()
-
-    def merge_overlapping_pixel_objects(self):
-        # merge objects with overlapping x-y tuples together
-        center = 0
-        max_entry = len(self.pixelObjList) - 1
-        # old_len = len(self.pixelObjList)
-        # flag = False
-        while center < max_entry:
-            tmp = self.check_overlap(center)
-            if tmp is False:
-                center += 1
-            else:
-                for ent in self.pixelObjList[tmp].XYset:
-                    self.pixelObjList[center].XYset.add(ent)
-                del self.pixelObjList[tmp]
-                max_entry = len(self.pixelObjList) - 1
+        # label objects made of white pixels that are 8-neighbours of each other
+        self.clear_objects()
+        self.labels, self.pixelObjList = label_pixel_objects(
+            bw_rows, offset=self.offset)
+
+        if self.pixelObjList:
+            # objects keep their pixel count and coordinate sums, so finding
+            # the largest object's size and centre needs no pixel iteration
+            largest = max(self.pixelObjList, key=PixelObject.count_pixel)
+            self.max_pixel_count = largest.count_pixel()
+            self.largest_object_id = largest.id_
+            self.largest_X, self.largest_Y = largest.compute_mean_coord(
+                self.frame_shape[0])
+            self.largest_bbox = largest.bbox
+            self.rank_candidates()
+
+        if self.debug != DEBUG_OFF:
+            self.new_one_pixel_png()
+
+    def rank_candidates(self):
+        """
+        Rank the objects larger than `min_object_size` as pick candidates,
+        largest first.
 
-        for obj in self.pixelObjList:
-            object_pixels = obj.count_pixel()
-            # if self.max_pixel_count == 0:
-            #     results['max_pixel_count'] = object_pixels
-            #     results['object_id'] = obj.id_
-            if object_pixels > self.max_pixel_count:
-                self.max_pixel_count = object_pixels
-                self.largest_object_id = obj.id_
-                x, y = obj.compute_mean_coord()
-                self.largest_X = x
-                self.largest_Y = y
-
-            # print obj.XYset
-            rows = []
-            for _ in range(96):
-                rows.append(range(96))
-            for j in range(96):
-                for i in range(96):
-                    if (i, j) in obj.XYset:
-                        rows[j][i] = 255
-                    else:
-                        rows[j][i] = 0
-                        # self.save_PNG(string.join([str(obj.id_), 'pixpro.png'], ''), rows)
-
-        # print("nmbr of pre Objects:{0}".format(old_len))
-        self.new_one_pixel_png()
+        A candidate's confidence is the share of its bounding box that its
+        pixels fill, scaled down for objects less than twice the minimum size.
+        """
+        frame_height = self.frame_shape[0]
+        objects = [obj for obj in self.pixelObjList
+                   if obj.count_pixel() > self.min_object_size]
+        objects.sort(key=PixelObject.count_pixel, reverse=True)
+        self.candidates = []
+        for obj in objects:
+            x, y = obj.compute_mean_coord(frame_height)
+            x0, y0, x1, y1 = obj.bbox
+            size = obj.count_pixel()
+            fill = float(size) / ((x1 - x0) * (y1 - y0))
+            scale = min(1.0, size / (2.0 * self.min_object_size)) \
+                if self.min_object_size else 1.0
+            self.candidates.append({
+                'x': x,
+                'y': y,
+                'size': size,
+                'bbox': [x0, y0, x1, y1],
+                'confidence': round(fill * scale, 3)
+            })
 
     def new_one_pixel_png(self):
         """
         make a new png with 1 pixel per object at their respective center
         :return:
         """
-        tmp_pos_list = []
-
+        rows = np.zeros(self.frame_shape, dtype=np.uint8)
         for obj in self.pixelObjList:
+            obj.compute_mean_coord(self.frame_shape[0])
             print("X:{0} Y:{1}".format(obj.coord_x, obj.coord_y))
-            tmp_pos_list.append((obj.coord_x, obj.coord_real_y))
-
-        rows = []
-        for _ in range(96):
-            rows.append(range(96))
-        for j in range(96):
-            for i in range(96):
-                if (i, j) in tmp_pos_list:
-                    rows[j][i] = 255
-                else:
-                    rows[j][i] = 0
+            rows[obj.coord_real_y, obj.coord_x] = 255
 
         self.save_PNG('PixelObjectPos.png', rows)
 
-    def check_overlap(self, counter):
-        """
-        check for overlapping x-y tuples in sets in 2 distinct objects
-        return the listNumber for the object with overlapping pixels if there
-        are overlapping pixels return False if not
-        """
-        max_entry = len(self.pixelObjList) - 1
-        for ent1 in self.pixelObjList[counter].XYset:
-            for i in range(counter + 1, max_entry + 1, 1):
-                for ent2 in self.pixelObjList[i].XYset:
-                    if ent1 == ent2:
-                        return i
-        return False
-
     def save_PNG(self, filename, rws):
-        # print("[save_PNG] filename:{0} rws:{1}".format(filename, rws))
+        # keep the image until the frame's debug policy decides its fate
         name = 'img/{0}'.format(filename)
-        f = open(name, 'wb')
-        w = png.Writer(96, 96, greyscale=True)
-        w.write(f, rws)
-        f.close()
+        if self.debug != DEBUG_OFF:
+            self._debug_images.append((name, rws))
         return name
-
-    def difference(self, a, b):
-        if a >= b:
-            return a - b
-        else:
-            return b - a
-
-    def fusion(self, a, b):
-        a_ = int(a)
-        b_ = int(b)
-        tmp = round(math.sqrt(a_ * a_ + b_ * b_))
-        if tmp <= 255:
-            return int(tmp)
-        else:
-            return 255
-
-    def neighbors(self, (x, y), max_x, max_y):
-        n_list = []
-        xx, yy = (x, y)
-        for y_ in range(-1, 2, 1):
-            for x_ in range(-1, 2, 1):
-                res_x = xx + x_
-                res_y = yy + y_
-                if max_x > res_x >= 0 and max_y > res_y >= 0:
-                    n_list.append((res_x, res_y))
-        return n_list
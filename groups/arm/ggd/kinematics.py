@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You may not
+# use this file except in compliance with the License. A copy of the License is
+# located at
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""
+Inverse kinematics of the arm's base, femur and tibia chain.
+
+The base turns the arm about a vertical axis, then the femur and the tibia,
+with the end-effector carried in line with it, form a planar two link chain.
+A pick at an image pixel is solved by mapping the pixel onto the belt and
+solving the chain's angles to reach it, which are then turned into servo
+values.
+
+The link lengths are the distances between the servo mounts of the
+`models/arm` femur and tibia. The camera and servo constants were fitted to
+the tuned `polar_goals` table by least squares, so that the solved goals stay
+in the poses the arm is known to pick in, and the solved goals are clamped to
+the servo ranges of the tuned goals. They should be measured on every arm.
+"""
+import math
+import logging
+import numpy as np
+
+from cachetools import LRUCache
+
+log = logging.getLogger('kinematics')
+handler = logging.StreamHandler()
+formatter = logging.Formatter(
+    '%(asctime)s|%(name)-8s|%(levelname)s: %(message)s')
+handler.setFormatter(formatter)
+log.addHandler(handler)
+log.setLevel(logging.INFO)
+
+FEMUR_LENGTH = 174.0  # mm between the femur's servo mounts, gg_femur_v3
+TIBIA_LENGTH = 140.0  # mm between the tibia's servo mounts, gg_tibia_v3
+EFFECTOR_LENGTH = 60.0  # mm from the tibia's end to the grip, gg_upper_ef_v5
+# the camera and servo constants below are fitted to the polar_goals table
+SHOULDER_HEIGHT = 50.0  # mm of the femur's axis above the belt
+MM_PER_PIXEL = 2.5  # belt mm covered by one pixel seen from the home pose
+CAMERA_Y_OFFSET = 20.0  # belt mm from the base's axis to the image's y=0
+IMAGE_CENTER_X = 48  # the image x coordinate in line with the base's axis
+
+DEGREES_PER_UNIT = 300.0 / 1024  # AX-12 servos turn 300 degrees over 1024
+BASE_STRAIGHT = 499  # base servo value facing straight along the image's y
+FEMUR_VERTICAL = 539  # femur servo value holding the femur upright
+TIBIA_STRAIGHT = 708  # tibia servo value holding the tibia in line with femur
+FEMUR_SIGN = -1  # servo value direction of leaning the femur forward
+TIBIA_SIGN = -1  # servo value direction of bending the tibia down
+# the (lowest, highest) servo values of the tuned pick goals, which the solved
+# goals are clamped to
+BASE_RANGE = (230, 770)
+FEMUR_RANGE = (363, 451)
+TIBIA_RANGE = (150, 420)
+
+IK_CACHE_SIZE = 256  # solved pixel goals kept
+
+
+def solve_chain(reach, height, upper=FEMUR_LENGTH,
+                lower=TIBIA_LENGTH + EFFECTOR_LENGTH):
+    """
+    Solve the angles of a planar two link chain reaching a point, with the
+    elbow above the line from the shoulder to the point.
+
+    :param reach: horizontal distance from the shoulder to the point, or array
+    :param height: vertical distance from the shoulder to the point, or array
+    :param upper: length of the link at the shoulder
+    :param lower: length of the link at the elbow
+    :return: shoulder, elbow
+        shoulder - radians of the upper link above the horizontal
+        elbow - radians the lower link bends down from the upper link's line
+        Both are NaN where the point is out of reach.
+    """
+    reach = np.asarray(reach, dtype=np.float64)
+    height = np.asarray(height, dtype=np.float64)
+    distance_sq = reach ** 2 + height ** 2
+    cos_elbow = (distance_sq - upper ** 2 - lower ** 2) / (2 * upper * lower)
+    # out of reach points have no cosine, NaN marks them
+    cos_elbow = np.where(np.abs(cos_elbow) <= 1, cos_elbow, np.nan)
+    elbow = np.arccos(cos_elbow)
+    shoulder = np.arctan2(height, reach) + np.arctan2(
+        lower * np.sin(elbow), upper + lower * np.cos(elbow))
+    return shoulder, elbow
+
+
+class ArmKinematics(object):
+    """
+    Solves the pick goals of the base, femur and tibia servos at image pixels.
+    It offers the same `goals` lookups as a `calibration.GoalTable`.
+    """
+
+    def __init__(self, mm_per_pixel=MM_PER_PIXEL,
+                 camera_y_offset=CAMERA_Y_OFFSET,
+                 shoulder_height=SHOULDER_HEIGHT,
+                 cache_size=IK_CACHE_SIZE):
+        """
+
+        :param mm_per_pixel: belt mm covered by one pixel
+        :param camera_y_offset: belt mm from the base's axis to the image's
+            y=0 row
+        :param shoulder_height: mm of the femur's axis above the belt
+        :param cache_size: how many solved pixel goals are kept
+        """
+        super(ArmKinematics, self).__init__()
+        self.mm_per_pixel = mm_per_pixel
+        self.camera_y_offset = camera_y_offset
+        self.shoulder_height = shoulder_height
+        self.cache = LRUCache(maxsize=cache_size)
+
+    def pixel_to_belt(self, x, y):
+        """
+        :return: the belt mm of image pixels, across and along the base's
+            straight direction, as arrays
+        """
+        across = (np.asarray(x, dtype=np.float64) - IMAGE_CENTER_X) * \
+            self.mm_per_pixel
+        along = np.asarray(y, dtype=np.float64) * self.mm_per_pixel + \
+            self.camera_y_offset
+        return across, along
+
+    def solve(self, x, y):
+        """
+        Solve the pick goals of image pixels.
+
+        :param x: x coordinate, or array of them
+        :param y: y coordinate counting up from the image's bottom, or array
+        :return: base, femur, tibia servo values as float arrays, clamped to
+            the servo ranges of the tuned goals, NaN where the pixel is out of
+            reach
+        """
+        across, along = self.pixel_to_belt(x, y)
+        yaw = np.degrees(np.arctan2(across, along))
+        shoulder, elbow = solve_chain(
+            np.hypot(across, along), -self.shoulder_height)
+
+        base = BASE_STRAIGHT - yaw / DEGREES_PER_UNIT
+        # the femur leans forward from upright by 90 degrees less the
+        # shoulder's angle above the horizontal
+        femur = FEMUR_VERTICAL + FEMUR_SIGN * (
+            90 - np.degrees(shoulder)) / DEGREES_PER_UNIT
+        tibia = TIBIA_STRAIGHT + TIBIA_SIGN * np.degrees(
+            elbow) / DEGREES_PER_UNIT
+
+        goals = np.rint([base, femur, tibia])
+        goals[:, np.isnan(goals).any(axis=0)] = np.nan
+        # NaN stays NaN through the clip
+        return (np.clip(goals[0], *BASE_RANGE),
+                np.clip(goals[1], *FEMUR_RANGE),
+                np.clip(goals[2], *TIBIA_RANGE))
+
+    def goals(self, x, y):
+        """
+        :param x: x coordinate of the pick
+        :param y: y coordinate of the pick
+        :return: base, femur, tibia goals
+        """
+        key = (int(x), int(y))
+        if key not in self.cache:
+            self.goals_of([key])
+        goals = self.cache[key]
+        if goals is None:
+            raise ValueError("Cannot reach x:{0} y:{1}".format(x, y))
+        return goals
+
+    def goals_of(self, points):
+        """
+        Solve the goals of many picks at once, such as all the candidates of
+        a find, keeping them for later `goals` lookups.
+
+        :param points: list of (x, y) coordinates or of dicts with 'x' and 'y'
+        :return: list of the base, femur, tibia goals of the points, None for
+            the points out of reach
+        """
+        keys = [(int(p['x']), int(p['y'])) if isinstance(p, dict) else
+                (int(p[0]), int(p[1])) for p in points]
+        unsolved = [key for key in set(keys) if key not in self.cache]
+        if unsolved:
+            x, y = zip(*unsolved)
+            base, femur, tibia = self.solve(x, y)
+            for i, key in enumerate(unsolved):
+                if math.isnan(base[i]):
+                    self.cache[key] = None
+                    log.info("[goals_of] cannot reach x:{0} y:{1}".format(
+                        *key))
+                else:
+                    self.cache[key] = (
+                        int(base[i]), int(femur[i]), int(tibia[i]))
+        return [self.cache.get(key) for key in keys]
@@ -1,58 +1,111 @@
 from __future__ import print_function
 
 """
-A class that can both count the pixels contained within an instance and 
+A class that can both count the pixels contained within an instance and
 determine the mean x, y coordinates of the instance.
+
+The count, coordinate sums and bounding box of the pixels are kept up to date
+as pixels are added, so the size and the mean coordinates of an object are
+available without iterating over its pixels.
 """
 
 
-class PixelObject:
+class PixelObject(object):
+    __slots__ = ('id_', 'numberOfPixels', 'sum_x', 'sum_y',
+                 'min_x', 'min_y', 'max_x', 'max_y',
+                 'coord_x', 'coord_y', 'coord_real_y', 'mask')
+
+    def __init__(self, id_, keep_mask=False):
+        """
 
-    def __init__(self, id_):
-        self.XYset = set()
+        :param id_: the id of the object
+        :param keep_mask: also keep which pixels belong to the object, packed
+            as one integer bitmask per row
+        """
         self.id_ = id_
         self.numberOfPixels = 0
+        self.sum_x = 0
+        self.sum_y = 0
+        self.min_x = self.min_y = None
+        self.max_x = self.max_y = None
         self.coord_x = 0
         self.coord_y = 0
         self.coord_real_y = 0
-        print("new object made with id: ", self.id_)
-
-    def check_xy_set(self, entry_list):
-        flag = False
-        for entry in entry_list:
-            if len(self.XYset) is 0:
-                self.XYset.add(entry)
-            if entry in self.XYset:
-                flag = True
-        if flag is True:
-            for entry in entry_list:
-                self.XYset.add(entry)
-        return flag
+        self.mask = dict() if keep_mask else None
 
-    def count_pixel(self):
-        self.numberOfPixels = len(self.XYset)
-        print("Object ID:{0}".format(self.id_))
-        print("Number of Pixels:{0}".format(self.numberOfPixels))
+    def add(self, x, y):
+        self.add_run(y, x, x + 1)
+
+    def add_run(self, y, start, end):
+        """
+        Add the run of pixels from `start` up to, not including, `end` on row
+        `y` to the object.
+        """
+        length = end - start
+        self.numberOfPixels += length
+        self.sum_x += (start + end - 1) * length // 2
+        self.sum_y += y * length
+        if self.min_x is None:
+            self.min_x, self.max_x = start, end - 1
+            self.min_y = self.max_y = y
+        else:
+            self.min_x = min(self.min_x, start)
+            self.max_x = max(self.max_x, end - 1)
+            self.min_y = min(self.min_y, y)
+            self.max_y = max(self.max_y, y)
+        if self.mask is not None:
+            self.mask[y] = self.mask.get(y, 0) | ((1 << length) - 1) << start
+
+    def merge(self, other):
+        """
+        Add the pixels of another PixelObject to this object.
+        """
+        if other.numberOfPixels == 0:
+            return
+        if self.numberOfPixels == 0:
+            self.min_x, self.max_x = other.min_x, other.max_x
+            self.min_y, self.max_y = other.min_y, other.max_y
+        else:
+            self.min_x = min(self.min_x, other.min_x)
+            self.max_x = max(self.max_x, other.max_x)
+            self.min_y = min(self.min_y, other.min_y)
+            self.max_y = max(self.max_y, other.max_y)
+        self.numberOfPixels += other.numberOfPixels
+        self.sum_x += other.sum_x
+        self.sum_y += other.sum_y
+        if self.mask is not None and other.mask is not None:
+            for y, bits in other.mask.items():
+                self.mask[y] = self.mask.get(y, 0) | bits
 
+    def contains(self, x, y):
+        if self.mask is None:
+            raise ValueError("PixelObject:{0} keeps no mask".format(self.id_))
+        return bool(self.mask.get(y, 0) >> x & 1)
+
+    @property
+    def bbox(self):
+        """
+        :return: the (min_x, min_y, max_x, max_y) bounding box of the object
+            with exclusive maximums, or None if the object has no pixels
+        """
+        if self.numberOfPixels == 0:
+            return None
+        return self.min_x, self.min_y, self.max_x + 1, self.max_y + 1
+
+    def count_pixel(self):
         return self.numberOfPixels
 
-    def compute_mean_coord(self):
-        # This code assumes only one object.
-        print('my current object id is:{0}'.format(self.id_))
-        if len(self.XYset) is 0:
+    def compute_mean_coord(self, frame_height=96):
+        """
+        :param frame_height: the height of the frame the object was found in,
+            used to make the mean y coordinate count up from the bottom
+        :return: the mean x, y coordinates of the object
+        """
+        if self.numberOfPixels == 0:
             return
-        temp_x = 0
-        temp_y = 0
-        for ent in self.XYset:
-            x, y = ent
-            temp_x += x
-            temp_y += y
-
-        self.coord_x = int(temp_x / len(self.XYset))
-        tmp = int(temp_y / len(self.XYset))
-        self.coord_real_y = tmp
-        self.coord_y = 96 - tmp  # currently assumes 96 pixel wide images
 
-        print("X coord:{0}".format(self.coord_x))
-        print("Y coord:{0}".format(self.coord_y))
+        self.coord_x = self.sum_x // self.numberOfPixels
+        tmp = self.sum_y // self.numberOfPixels
+        self.coord_real_y = tmp
+        self.coord_y = frame_height - tmp
         return self.coord_x, self.coord_y
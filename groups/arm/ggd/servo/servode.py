@@ -3,10 +3,13 @@
 from __future__ import print_function
 
 import time
+import heapq
 import logging
 import datetime
 import argparse
+import itertools
 import threading
+import contextlib
 import collections
 from .dynamixel_functions import *
 
@@ -34,6 +37,19 @@ DEVICENAME = "/dev/ttyUSB0".encode('utf-8')
 
 COMM_SUCCESS = 0  # Communication Success result value
 COMM_TX_FAIL = -1001  # Communication Tx Failed
+# the contiguous control table span read for a snapshot of a servo's state
+SNAPSHOT_FIRST = 'goal_position'
+SNAPSHOT_LAST = 'moving'
+# unrequested bytes a bulk read emulation reads to join two registers into one
+# block read, as a read's own instruction and status packets cost more
+SPAN_GAP = 8
+
+# Bus priorities, the lowest number is served first
+ESTOP = 0  # emergency stops
+MOTION = 1  # writes, such as goal positions and speeds
+CONTROL_READ = 2  # reads that control decisions wait on
+TELEMETRY = 3  # reads of telemetry samples
+TELEMETRY_WAIT = 0.05  # seconds a telemetry read waits for the bus at most
 
 # Dynamixel control table addresses
 dxl_control = {
@@ -264,6 +280,128 @@ dxl_control = {
 }
 
 
+class BusBusy(IOError):
+    """
+    Raised when a telemetry transaction is dropped as the bus is busy with
+    transactions of higher priorities.
+    """
+    pass
+
+
+class BusScheduler(object):
+    """
+    The lock of a servo bus that grants the bus to waiting transactions by
+    priority, then in order of arrival. A transaction takes the priority set
+    for its thread with `priority`, or its own default priority.
+
+    Telemetry transactions wait for the bus at most `telemetry_wait` seconds
+    and are dropped after that, so telemetry sampled at any rate cannot
+    delay control for longer than a single transaction.
+    """
+
+    def __init__(self, telemetry_wait=TELEMETRY_WAIT):
+        super(BusScheduler, self).__init__()
+        self.telemetry_wait = telemetry_wait
+        self.dropped = 0
+        self._condition = threading.Condition(threading.Lock())
+        self._busy = False
+        self._waiting = list()  # heap of the (priority, arrival) of waiters
+        self._arrivals = itertools.count()
+        self._local = threading.local()
+
+    def acquire(self, priority=MOTION, timeout=None):
+        """
+        Wait for the bus.
+
+        :param priority: the priority of the transaction
+        :param timeout: seconds to wait at most, None waits without a limit
+        :return: True if the bus was acquired, False if the wait timed out
+        """
+        with self._condition:
+            ticket = (priority, next(self._arrivals))
+            heapq.heappush(self._waiting, ticket)
+            deadline = None if timeout is None else time.time() + timeout
+            while self._busy or self._waiting[0] != ticket:
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        self._waiting.remove(ticket)
+                        heapq.heapify(self._waiting)
+                        self._condition.notify_all()
+                        return False
+                self._condition.wait(remaining)
+            heapq.heappop(self._waiting)
+            self._busy = True
+            return True
+
+    def release(self):
+        with self._condition:
+            self._busy = False
+            self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def priority(self, priority):
+        """
+        Set the priority of the transactions of the calling thread.
+        """
+        previous = getattr(self._local, 'priority', None)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    @contextlib.contextmanager
+    def transaction(self, default=MOTION):
+        """
+        Hold the bus for a transaction.
+
+        :param default: the priority of the transaction if none is set for
+            the calling thread
+        :raise BusBusy: if the transaction is telemetry and was dropped
+        """
+        priority = getattr(self._local, 'priority', None)
+        if priority is None:
+            priority = default
+        timeout = self.telemetry_wait if priority >= TELEMETRY else None
+        if not self.acquire(priority, timeout):
+            self.dropped += 1
+            raise BusBusy("[transaction] bus busy, dropped:{0}".format(
+                self.dropped))
+        try:
+            yield
+        finally:
+            self.release()
+
+
+def plan_spans(registers, max_gap=SPAN_GAP):
+    """
+    Plan the fewest contiguous block reads covering the registers, joining
+    two registers into one read when at most `max_gap` unrequested bytes lie
+    between them.
+
+    :param registers: the registers to read
+    :param max_gap: the most unrequested bytes a read covers between two
+        requested registers
+    :return: a list of (start, end, registers) tuples in address order
+        start - the address the read starts at
+        end - the address after the read's last byte
+        registers - the requested registers the read covers
+    """
+    spans = list()
+    for register in sorted(set(registers),
+                           key=lambda r: dxl_control[r]['address']):
+        address = dxl_control[register]['address']
+        end = address + dxl_control[register]['comm_bytes']
+        if spans and address - spans[-1][1] <= max_gap:
+            start, last_end, covered = spans[-1]
+            spans[-1] = (start, max(last_end, end), covered + [register])
+        else:
+            spans.append((address, end, [register]))
+    return spans
+
+
 class Servo(object):
 
     def __init__(self, sp, servo_id=1, read_cache=None):
@@ -281,6 +419,8 @@ class Servo(object):
         self.sp = sp
         self.read_cache = read_cache
         self._status = {}
+        self._block = {}
+        self.block_time = None  # when the last block was read
         log.debug("[Servo.__init__] read_cache:{0}".format(read_cache))
 
     def _fill_status(self, result):
@@ -349,6 +489,31 @@ class Servo(object):
             self.read_cache[register] = result['value']
         return result['value']
 
+    def read_block(self, first=SNAPSHOT_FIRST, last=SNAPSHOT_LAST):
+        """
+        Read every register from `first` through `last` with a single read.
+
+        :param first: the register starting the block
+        :param last: the register ending the block
+        :return: a dict of the value of every register in the block. If the
+            bus is too busy for a telemetry read, the values last read, which
+            were read at `block_time`.
+        """
+        try:
+            result = self.sp.read_block(self.servo_id, first, last)
+        except BusBusy:
+            # a dropped telemetry read is coalesced into the last one read
+            log.debug("[read_block] servo_id:{0} bus busy".format(
+                self.servo_id))
+            return dict(self._block)
+
+        self._block = result['values']
+        self.block_time = datetime.datetime.now()
+        if self.read_cache is not None:
+            for register, value in result['values'].items():
+                self.read_cache[register] = value
+        return result['values']
+
     def write(self, register, value):
         result = self.sp.write_register(self.servo_id, register, value)
         # self._fill_status(result)
@@ -366,6 +531,8 @@ class ServoGroup(object):
     iterating over them.
     """
     POSITION_MARGIN = 50
+    MOTION_POLL_INTERVAL = 0.02  # seconds between the polls of a motion
+    MOTION_TIMEOUT = 10  # seconds to wait for a motion to complete
 
     def __init__(self):
         super(ServoGroup, self).__init__()
@@ -407,6 +574,29 @@ class ServoGroup(object):
             ids.append(self.servos[key].servo_id)
         return ids
 
+    def priority(self, priority):
+        """
+        Set the bus priority of the calling thread's transactions with the
+        group's servos, such as `TELEMETRY` for telemetry samples.
+
+        :return: a context manager holding the priority
+        """
+        return self._get_sp().priority(priority)
+
+    def snapshot(self, first=SNAPSHOT_FIRST, last=SNAPSHOT_LAST):
+        """
+        Read the registers from `first` through `last` of every servo in the
+        group, with a single read per servo.
+
+        :param first: the register starting the block
+        :param last: the register ending the block
+        :return: an OrderedDict of the servo names and the dicts of their
+            register values, in servo order
+        """
+        return collections.OrderedDict(
+            (servo, self.servos[servo].read_block(first, last))
+            for servo in self.servos)
+
     def wheel_mode(self, enable=True):
         if self._wheel_mode == enable:
             return
@@ -466,88 +656,148 @@ class ServoGroup(object):
     def write_values(self, register, values):
         """
         Write the list of values to the register on every servo in the
-        ServoGroup.
+        ServoGroup, synchronously in a single SYNC_WRITE packet.
         Note: the length of the values list should equal the length of the
         ServoGroup
 
         :param register:
         :param values: the list of values to write in servo order
-        :return: None
+        :return: True if success, False if not
         """
-        t = 0
         log.debug(
             '[ServoGroup.write_values] len(self):{0} len(values):{1}'.format(
                 len(self), len(values)))
+        if len(self) > len(values):
+            log.warn(
+                "[ServoGroup.write_values] more group members than values.")
+
+        servos = list(self.servos.values())[:len(values)]
+        log.debug("[ServoGroup.write_values] register:{0} values:{1}".format(
+            register, values[:len(servos)]))
+        return self._get_sp().sync_write_values(
+            register=register,
+            values=values[:len(servos)],
+            servo_list=[servo.servo_id for servo in servos]
+        )
 
-        for servo in self.servos.values():
-            if t < min(len(self), len(values)):
-                log.info(
-                    "[ServoGroup.write_values] servo:{0} values[{1}]:{2}".format(
-                        servo, t, values[t]
-                    ))
-                servo.write(register, values[t])
-            else:
-                log.warn(
-                    "[ServoGroup.write_values] more group members than values.")
-            t += 1
+    def write_registers(self, registers, values):
+        """
+        Write the list of values to contiguous registers on every servo in
+        the ServoGroup, synchronously in a single SYNC_WRITE packet.
+
+        :param registers: the list of registers to write, in address order
+        :param values: the list of a tuple of the register values per servo,
+            in servo order
+        :return: True if success, False if not
+        """
+        if len(self) > len(values):
+            log.warn(
+                "[ServoGroup.write_registers] more group members than values.")
+
+        servos = list(self.servos.values())[:len(values)]
+        log.debug("[ServoGroup.write_registers] registers:{0} values:{1}".
+                  format(registers, values[:len(servos)]))
+        return self._get_sp().sync_write_registers(
+            registers=registers,
+            values=values[:len(servos)],
+            servo_list=[servo.servo_id for servo in servos]
+        )
 
     def goal_position(self, goal_positions,
+                      speeds=None,
                       block=False,
                       should_run=None,
-                      margin=POSITION_MARGIN):
+                      margin=POSITION_MARGIN,
+                      poll_interval=MOTION_POLL_INTERVAL,
+                      timeout=MOTION_TIMEOUT):
         """
 
         :param goal_positions: the list of goal position values to write in
             servo order
-        :param block: Validate that present_position for each servo is within
-            `margin` of the goal position. Block until validation occurs.
-        :param should_run: `threading.Event` used to interrupt block if
-            necessary, will be cleared when goal position is met.
-        :param margin:
-        :return:
+        :param speeds: the list of moving speed values to write in servo
+            order, in the same packet as the goal positions. If None, the
+            servos keep their moving speeds.
+        :param block: Block until the motion is complete, see `wait_motion`.
+        :param should_run: `threading.Event` that interrupts a block when it
+            is cleared. It is not changed by the block.
+        :param margin: how close to its goal position a servo is complete
+        :param poll_interval: seconds between the motion polls of a block
+        :param timeout: seconds a block waits for the motion at most
+        :return: True if the motion completed or did not block, False if a
+            block was interrupted or timed out
         """
         log.info("[goal_position] requested positions:{0}".format(
             goal_positions))
 
-        self.write_values('goal_position', goal_positions)
-
-        event = should_run
-        if block is True and event is None:
-            log.info("[goal_position] using local event")
-            event = threading.Event()
-            event.clear()
-            event.set()
-
-        if block:
-            while event.is_set():
-                close = dict()
-                i = 0
-                for servo in self.servos:
-                    s = self.servos[servo]
-                    pos = s['present_position']
-                    goal = goal_positions[i]
-                    log.debug(
-                        "[goal_position] 'present_position' id:{0} is:{1}".format(
-                            s.servo_id, pos))
+        if speeds is None:
+            self.write_values('goal_position', goal_positions)
+        else:
+            self.write_registers(['goal_position', 'moving_speed'],
+                                 list(zip(goal_positions, speeds)))
 
-                    horseshoes = margin + goal
-                    hand_grenades = goal - margin
-                    if hand_grenades < 0:
-                        hand_grenades = 0
+        if not block:
+            return True
 
-                    # we are close enough when servo position is between
-                    # horseshoes and hand grenades
-                    if horseshoes > pos > hand_grenades:
-                        close[servo] = pos
-                    i += 1
+        return self.wait_motion(goal_positions, should_run=should_run,
+                                margin=margin, poll_interval=poll_interval,
+                                timeout=timeout)
 
-                if len(close) == len(self.servos):
-                    # all servos close when the dict has a value per servo
-                    event.clear()
+    def wait_motion(self, goal_positions,
+                    should_run=None,
+                    margin=POSITION_MARGIN,
+                    poll_interval=MOTION_POLL_INTERVAL,
+                    timeout=MOTION_TIMEOUT):
+        """
+        Wait until every servo has completed its motion to its goal position.
+        A servo is complete once its 'moving' register reads that it stopped,
+        or once its present position is within `margin` of its goal.
+
+        :param goal_positions: the list of goal position values in servo order
+        :param should_run: `threading.Event` that interrupts the wait when it
+            is cleared
+        :param margin: how close to its goal position a servo is complete
+        :param poll_interval: seconds between the polls of the servos
+        :param timeout: seconds to wait at most, None waits without a limit
+        :return: True if the motion completed, False if the wait was
+            interrupted or timed out
+        """
+        pending = collections.OrderedDict(zip(self.servos, goal_positions))
+        close = dict()
+        start = time.time()
+        while True:
+            if should_run is not None and not should_run.is_set():
+                log.info("[wait_motion] interrupted with pending:{0}".format(
+                    list(pending)))
+                return False
+
+            for servo, goal in list(pending.items()):
+                s = self.servos[servo]
+                if s['moving'] == 0:
+                    # stopped, at its goal or as near as it can get
+                    close[servo] = goal
+                    del pending[servo]
+                    continue
+
+                pos = s['present_position']
+                log.debug(
+                    "[wait_motion] 'present_position' id:{0} is:{1}".format(
+                        s.servo_id, pos))
+                if abs(goal - pos) < margin:
+                    close[servo] = pos
+                    del pending[servo]
+
+            if not pending:
+                log.info("[wait_motion] close positions:{0} in:{1:.2f}s".
+                         format(close, time.time() - start))
+                return True
 
-                log.info("[goal_position] actual close positions:{0}".format(
-                    close))
-                time.sleep(0.5)
+            if timeout is not None and time.time() - start > timeout:
+                log.warning(
+                    "[wait_motion] timed out after {0}s pending:{1}".format(
+                        timeout, list(pending)))
+                return False
+
+            time.sleep(poll_interval)
 
 
 class ServoProtocol(object):
@@ -586,13 +836,15 @@ class ServoProtocol(object):
 
     def __init__(self, baud_rate=BAUDRATE_PERM, manufacturer=ROBOTIS,
                  servo_type=AX_12_TYPE, protocol_version=PROTOCOL_V,
-                 lock=threading.Lock()):
+                 lock=BusScheduler()):
         """
 
         :param baud_rate:
         :param manufacturer:
         :param servo_type:
         :param protocol_version:
+        :param lock: the BusScheduler every transaction on the bus goes
+            through
         """
         super(ServoProtocol, self).__init__()
         if servo_type == AX_12_TYPE:
@@ -638,6 +890,14 @@ class ServoProtocol(object):
         closePort(self.port_num)
         # self.lock.release()
 
+    def priority(self, priority):
+        """
+        Set the bus priority of the calling thread's transactions.
+
+        :return: a context manager holding the priority
+        """
+        return self.lock.priority(priority)
+
     def factory_reset(self, servo):
         """
 
@@ -651,7 +911,7 @@ class ServoProtocol(object):
 
         log.debug("[factory_reset] Try reset:{0}".format(sid))
         factoryReset(self.port_num, self.protocol_version, sid, 0x00)
-        with self.lock:
+        with self.lock.transaction(MOTION):
             last_result = getLastTxRxResult(
                 self.port_num, self.protocol_version)
             if last_result != COMM_SUCCESS:
@@ -681,7 +941,7 @@ class ServoProtocol(object):
         else:
             sid = servo
 
-        with self.lock:
+        with self.lock.transaction(CONTROL_READ):
             dxl_model_number = pingGetModelNum(
                 self.port_num, self.protocol_version, sid)
 
@@ -722,7 +982,7 @@ class ServoProtocol(object):
         else:
             sid = servo
 
-        with self.lock:
+        with self.lock.transaction(CONTROL_READ):
             if dxl_control[register]['comm_bytes'] == 1:
                 value = read1ByteTxRx(
                     self.port_num, self.protocol_version, sid,
@@ -757,8 +1017,108 @@ class ServoProtocol(object):
         result['value'] = value
         return result
 
+    def read_block(self, servo, first, last):
+        """
+        Read every register from `first` through `last` with a single
+        READ_DATA instruction, and decode the registers from its data.
+
+        :param servo: a Servo object or an integer servo_id
+        :param first: the register starting the block
+        :param last: the register ending the block
+        :return: a dict containing:
+            { "values": <a dict of the value read from every register>,
+              "status": <a dict containing the status bit states>
+            }
+        """
+        if isinstance(servo, Servo):
+            sid = servo.servo_id
+        else:
+            sid = servo
+
+        start = dxl_control[first]['address']
+        end = dxl_control[last]['address'] + dxl_control[last]['comm_bytes']
+        registers = [r for r in dxl_control
+                     if start <= dxl_control[r]['address'] < end]
+
+        with self.lock.transaction(CONTROL_READ):
+            return self._read_span(sid, start, end, registers)
+
+    def _read_span(self, sid, start, end, registers):
+        # read the span's bytes with one READ_DATA, the caller holds the lock
+        result = {
+            "values": {},
+            "status": {}
+        }
+        readTxRx(self.port_num, self.protocol_version, sid, start,
+                 end - start)
+
+        last_result = getLastTxRxResult(
+            self.port_num, self.protocol_version
+        )
+        if last_result != COMM_SUCCESS:
+            printTxRxResult(self.protocol_version, last_result)
+            log.error("[read_block] Comm unsuccessful:{0}".format(
+                last_result))
+            return result
+
+        error_result = getLastRxPacketError(
+            self.port_num, self.protocol_version)
+        if error_result:
+            result['status'] = self._result_to_status(error_result)
+            printRxPacketError(self.protocol_version, error_result)
+            log.error("[read_block] Error:{0}".format(error_result))
+
+        for register in registers:
+            result['values'][register] = getDataRead(
+                self.port_num, self.protocol_version,
+                dxl_control[register]['comm_bytes'],
+                dxl_control[register]['address'] - start
+            )
+        return result
+
+    def _emulate_bulk_read(self, read_blocks):
+        """
+        Emulate a bulk read on servos without the BULK_READ instruction, with
+        the fewest block reads of every servo's registers, all under a single
+        acquisition of the lock.
+        """
+        registers = collections.OrderedDict()
+        for block in read_blocks['blocks']:
+            registers.setdefault(block['servo_id'], []).append(
+                block['register'])
+
+        values = dict()
+        with self.lock.transaction(CONTROL_READ):
+            for sid in registers:
+                for start, end, covered in plan_spans(registers[sid]):
+                    result = self._read_span(sid, start, end, covered)
+                    if not result['values']:
+                        err = "[bulk_read] block read fail on " \
+                              "servo_id:{0}".format(sid)
+                        log.error(err)
+                        raise IOError(err)
+
+                    ts = datetime.datetime.now().isoformat()
+                    for register in covered:
+                        values[sid, register] = (
+                            result['values'][register], ts)
+
+        blocks = list()
+        for block in read_blocks['blocks']:
+            sid = block['servo_id']
+            register = block['register']
+            val, ts = values[sid, register]
+            blocks.append({
+                "servo_id": sid, "register": register,
+                "value": val, "ts": ts
+            })
+        return {"blocks": blocks}
+
     def bulk_read(self, read_blocks):
         """
+        Read registers of many servos at once. AX-12 servos do not support
+        the BULK_READ instruction, so their bulk read is emulated with the
+        fewest block reads of every servo's registers.
 
         :param read_blocks: a list of dicts in the following format which
         describe which registers to read from which servos.
@@ -780,7 +1140,8 @@ class ServoProtocol(object):
         """
         if self.servo_type == AX_12_TYPE and \
                 self.protocol_version == PROTOCOL_V:
-            raise NotImplementedError("AX-12 Servos do not support bulk_read.")
+            # AX-12 Servos do not support the BULK_READ instruction
+            return self._emulate_bulk_read(read_blocks)
 
         response = {"blocks": []}
         group_num = groupBulkRead(self.port_num, self.protocol_version)
@@ -864,7 +1225,7 @@ class ServoProtocol(object):
         log.debug("[write_register] servo id:{0} reg:'{1}' reg_addr:{2}".format(
             sid, register, dxl_control[register]['address']))
 
-        with self.lock:
+        with self.lock.transaction(MOTION):
             if dxl_control[register]['access'] == "r":
                 raise IOError(
                     "register:'{0}' cannot be written".format(register))
@@ -910,18 +1271,109 @@ class ServoProtocol(object):
         :param servo_list:
         :return:
         """
+        log.info("[sync_write] reg:'{0}' value:{1}".format(register, value))
+        return self.sync_write_values(
+            register, [value] * len(servo_list), servo_list)
+
+    def sync_write_registers(self, registers, values, servo_list):
+        """
+        Write values of their own to contiguous registers of every Servo in
+        the servo_list, synchronously in a single SYNC_WRITE packet. Such as
+        the 'goal_position' and 'moving_speed' of every servo.
+
+        :param registers: the list of registers to write, in address order
+            without gaps and at most 4 bytes long
+        :param values: the list of a tuple of the register values per servo,
+            in servo_list order
+        :param servo_list: the list of Servo objects or integer servo_ids
+        :return: True if success, False if not
+        """
+        address = dxl_control[registers[0]]['address']
+        data_length = 0
+        for register in registers:
+            if dxl_control[register]['address'] != address + data_length:
+                raise ValueError(
+                    "registers:{0} are not contiguous".format(registers))
+            if dxl_control[register]['access'] == "r":
+                raise IOError(
+                    "register:'{0}' cannot be written".format(register))
+            data_length += dxl_control[register]['comm_bytes']
+        if data_length > 4:
+            raise ValueError(
+                "registers:{0} are longer than 4 bytes".format(registers))
+
+        result = False
+        with self.lock.transaction(MOTION):
+            group_num = groupSyncWrite(
+                self.port_num, self.protocol_version, address, data_length)
+            log.debug("[sync_write_registers] regs:{0} values:{1}".format(
+                registers, values))
+            log.debug("[sync_write_registers] servo_list:{0}".format(
+                servo_list))
+
+            for servo, servo_values in zip(servo_list, values):
+                if isinstance(servo, Servo):
+                    sid = servo.servo_id
+                else:
+                    sid = servo
+
+                # the registers' values packed little-endian, in address order
+                data = 0
+                shift = 0
+                for register, value in zip(registers, servo_values):
+                    data |= value << shift
+                    shift += 8 * dxl_control[register]['comm_bytes']
+
+                add_parm = groupSyncWriteAddParam(
+                    group_num, sid, data, data_length)
+
+                if add_parm is False:
+                    log.error(
+                        "[sync_write_registers] ERROR servo_id:{0} add "
+                        "registers:{1}".format(sid, registers))
+                    return False
+
+            groupSyncWriteTxPacket(group_num)
+
+            last_result = getLastTxRxResult(
+                self.port_num, self.protocol_version
+            )
+            if last_result != COMM_SUCCESS:
+                printTxRxResult(self.protocol_version, last_result)
+                log.error(
+                    "[sync_write_registers] Comm unsuccessful:{0}".format(
+                        last_result))
+            else:
+                result = True
+
+        return result
+
+    def sync_write_values(self, register, values, servo_list):
+        """
+        Write a value of its own to the same register of every Servo in the
+        servo_list, synchronously in a single SYNC_WRITE packet.
+
+        :param register: the register to write
+        :param values: the list of values to write in servo_list order
+        :param servo_list: the list of Servo objects or integer servo_ids
+        :return: True if success, False if not
+        """
+        if dxl_control[register]['access'] == "r":
+            raise IOError(
+                "register:'{0}' cannot be written".format(register))
+
         result = False
-        with self.lock:
+        with self.lock.transaction(MOTION):
             group_num = groupSyncWrite(
                 self.port_num, self.protocol_version,
                 dxl_control[register]['address'],
                 dxl_control[register]['comm_bytes']
             )
-            log.info("[sync_write] reg:'{0}' value:{1}".format(
-                register, value))
-            log.info("[sync_write] servo_list:{0}".format(servo_list))
+            log.debug("[sync_write_values] reg:'{0}' values:{1}".format(
+                register, values))
+            log.debug("[sync_write_values] servo_list:{0}".format(servo_list))
 
-            for servo in servo_list:
+            for servo, value in zip(servo_list, values):
                 if isinstance(servo, Servo):
                     sid = servo.servo_id
                 else:
@@ -935,10 +1387,12 @@ class ServoProtocol(object):
 
                 if add_parm is False:
                     log.error(
-                        "[sync_write] ERROR servo_id:{0} add register:{1}", sid)
+                        "[sync_write_values] ERROR servo_id:{0} add "
+                        "register:{1}".format(sid, register))
                     return False
                 else:
-                    log.debug("[sync_write] added param to sync write")
+                    log.debug(
+                        "[sync_write_values] added param to sync write")
 
             groupSyncWriteTxPacket(group_num)
 
@@ -947,8 +1401,8 @@ class ServoProtocol(object):
             )
             if last_result != COMM_SUCCESS:
                 printTxRxResult(self.protocol_version, last_result)
-                log.error(
-                    "[sync_write] Comm unsuccessful:{0}".format(last_result))
+                log.error("[sync_write_values] Comm unsuccessful:{0}".format(
+                    last_result))
             else:
                 result = True
 
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You may not
+# use this file except in compliance with the License. A copy of the License is
+# located at
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""
+Unit tests of the servo bus scheduling, block read planning and sync write
+packing of `servode`. Run from the `ggd` directory with:
+
+    python -m unittest discover
+"""
+import sys
+import time
+import types
+import threading
+import unittest
+
+try:
+    from servo import servode
+except ImportError:
+    # the Dynamixel SDK wrapper is only copied in by servo_setup.py, and none
+    # of these tests talk to a servo bus
+    sys.modules['servo.dynamixel_functions'] = types.ModuleType(
+        'servo.dynamixel_functions')
+    from servo import servode
+
+
+class BusSchedulerTest(unittest.TestCase):
+
+    def test_priority_order(self):
+        scheduler = servode.BusScheduler()
+        granted = list()
+
+        def transaction(priority):
+            with scheduler.priority(priority):
+                with scheduler.transaction():
+                    granted.append(priority)
+
+        self.assertTrue(scheduler.acquire(servode.CONTROL_READ))
+        threads = list()
+        # the waiters arrive in the reverse order of their priority
+        for priority in (servode.CONTROL_READ, servode.MOTION,
+                         servode.ESTOP):
+            t = threading.Thread(target=transaction, args=(priority,))
+            t.start()
+            threads.append(t)
+            while len(scheduler._waiting) < len(threads):
+                time.sleep(0.001)
+        scheduler.release()
+        for t in threads:
+            t.join(5)
+
+        self.assertEqual(
+            granted, [servode.ESTOP, servode.MOTION, servode.CONTROL_READ])
+        self.assertEqual(scheduler.dropped, 0)
+
+    def test_telemetry_dropped_when_busy(self):
+        scheduler = servode.BusScheduler()
+        self.assertTrue(scheduler.acquire(servode.MOTION))
+        began = time.time()
+        with scheduler.priority(servode.TELEMETRY):
+            with self.assertRaises(servode.BusBusy):
+                with scheduler.transaction():
+                    self.fail("telemetry was granted a busy bus")
+        waited = time.time() - began
+        scheduler.release()
+
+        self.assertGreaterEqual(waited, servode.TELEMETRY_WAIT)
+        self.assertLess(waited, 1)
+        self.assertEqual(scheduler.dropped, 1)
+        self.assertEqual(scheduler._waiting, [])
+
+    def test_telemetry_granted_when_free(self):
+        scheduler = servode.BusScheduler()
+        with scheduler.priority(servode.TELEMETRY):
+            with scheduler.transaction():
+                pass
+        self.assertEqual(scheduler.dropped, 0)
+
+
+class PlanSpansTest(unittest.TestCase):
+
+    def test_near_registers_share_a_read(self):
+        self.assertEqual(
+            servode.plan_spans(['moving', 'present_position']),
+            [(36, 47, ['present_position', 'moving'])])
+
+    def test_far_registers_read_apart(self):
+        self.assertEqual(
+            servode.plan_spans(['moving', 'present_position'], max_gap=7),
+            [(36, 38, ['present_position']), (46, 47, ['moving'])])
+
+    def test_snapshot_is_a_single_read(self):
+        spans = servode.plan_spans(
+            [servode.SNAPSHOT_FIRST, 'present_load', servode.SNAPSHOT_LAST,
+             'present_load'])
+        self.assertEqual(len(spans), 1)
+        start, end, registers = spans[0]
+        self.assertEqual(start, 30)
+        self.assertEqual(end, 47)
+        self.assertEqual(
+            registers,
+            [servode.SNAPSHOT_FIRST, 'present_load', servode.SNAPSHOT_LAST])
+
+    def test_no_registers(self):
+        self.assertEqual(servode.plan_spans([]), [])
+
+
+class SyncWriteRegistersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.params = list()
+        self.packets = list()
+        self.sdk = dict()
+        stubs = {
+            'groupSyncWrite':
+                lambda port, protocol, address, length: (address, length),
+            'groupSyncWriteAddParam':
+                lambda group, sid, data, length:
+                    self.params.append((sid, data, length)) or True,
+            'groupSyncWriteTxPacket': self.packets.append,
+            'getLastTxRxResult':
+                lambda port, protocol: servode.COMM_SUCCESS,
+        }
+        for name, stub in stubs.items():
+            self.sdk[name] = getattr(servode, name, None)
+            setattr(servode, name, stub)
+
+        self.sp = servode.ServoProtocol.__new__(servode.ServoProtocol)
+        self.sp.lock = servode.BusScheduler()
+        self.sp.port_num = 0
+        self.sp.protocol_version = 1
+
+    def tearDown(self):
+        for name, original in self.sdk.items():
+            if original is None:
+                delattr(servode, name)
+            else:
+                setattr(servode, name, original)
+
+    def test_goal_and_speed_packed_in_one_packet(self):
+        self.assertTrue(self.sp.sync_write_registers(
+            ['goal_position', 'moving_speed'], [(700, 300), (512, 1023)],
+            [1, 2]))
+        self.assertEqual(self.packets, [(30, 4)])
+        self.assertEqual(self.params, [
+            (1, 700 | 300 << 16, 4),
+            (2, 512 | 1023 << 16, 4)])
+
+    def test_single_register(self):
+        self.assertTrue(self.sp.sync_write_registers(
+            ['moving_speed'], [(200,)], [3]))
+        self.assertEqual(self.packets, [(32, 2)])
+        self.assertEqual(self.params, [(3, 200, 2)])
+
+    def test_registers_not_contiguous(self):
+        with self.assertRaises(ValueError):
+            self.sp.sync_write_registers(
+                ['goal_position', 'torque_limit'], [(1, 2)], [1])
+        self.assertEqual(self.packets, [])
+
+    def test_registers_too_long(self):
+        with self.assertRaises(ValueError):
+            self.sp.sync_write_registers(
+                ['goal_position', 'moving_speed', 'torque_limit'],
+                [(1, 2, 3)], [1])
+        self.assertEqual(self.packets, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -24,16 +24,15 @@ Note: At this point in time, tuning of an arm requires modifications to the
 servo values contained in this file.
 """
 import math
-import time
 import logging
 import argparse
 import threading
-import numpy.ma as ma
+import numpy as np
 
-from decimal import Decimal, ROUND_HALF_UP
 from servo.servode import Servo, ServoGroup, ServoProtocol
 
 from image_processor import ImageProcessor
+from trajectory import Trajectory, Waypoint
 from . import arm_servo_ids
 
 log = logging.getLogger('stages')
@@ -51,7 +50,14 @@ HOME_FEMUR_2 = 520  # value of the 'home' position of the second femur servo
 HOME_TIBIA = 420  # servo value of the 'home' position of the tibia
 OPEN_EFFECTOR = 500  # servo value of the 'open' position of the end effector
 GRAB_EFFECTOR = 290  # servo value of 'grab' position of the end effector
+GRAB_TIMEOUT = 0.5  # seconds the end effector is given to close on a box
 POSITION_MARGIN = 75  # how close does the servo need to get the goal position
+CONFIRM_PADDING = 12  # pixels searched around a candidate to confirm it
+CONFIRM_DISTANCE = 8  # pixels a confirmed candidate's centre may have moved
+SETTLE_MARGIN = 20  # how close the servos get to a pick before grabbing
+TRAVEL_SPEED = 200  # moving_speed of the furthest moving servo in transit
+PICK_SPEED = 140  # moving_speed of the furthest moving servo picking a box
+SORT_SPEED = 150  # moving_speed of the furthest moving servo carrying a box
 NO_BOX_FOUND = {'x': None, 'y': None}
 MIN_OBJECT_SIZE = 200  # smallest object to try to pickup
 MAX_IMAGE_WIDTH = 96  # used for coordinate calculations and camera constraint
@@ -61,16 +67,16 @@ MAX_IMAGE_HEIGHT = 96  # used for coordinate calculations and camera constraint
 def cart2polar(x, y, degrees=True):
     """
     Convert cartesian X and Y to polar RHO and THETA.
-    :param x: x cartesian coordinate
-    :param y: y cartesian coordinate
+    :param x: x cartesian coordinate, or array of them
+    :param y: y cartesian coordinate, or array of them
     :param degrees: True = return theta in degrees, False = return theta in
         radians. [default: True]
     :return: r, theta
     """
-    rho = ma.sqrt(x ** 2 + y ** 2)
-    theta = ma.arctan2(y, x)
+    rho = np.sqrt(x ** 2 + y ** 2)
+    theta = np.arctan2(y, x)
     if degrees:
-        theta *= (180 / math.pi)
+        theta = theta * (180 / math.pi)
 
     return rho, theta
 
@@ -83,8 +89,8 @@ def polar2cart(rho, theta):
     :param theta: polar theta coordinate in degrees
     :return:
     """
-    x = rho * ma.cos(theta)
-    y = rho * ma.sin(theta)
+    x = rho * np.cos(theta)
+    y = rho * np.sin(theta)
     return x, y
 
 
@@ -93,15 +99,14 @@ def cartesian_goals(x, y):
     Use a cartesian coordinate system to calculate goals from given X and Y
     values.
 
-    :param x: x cartesian coordinate
-    :param y: y cartesian coordinate
-    :return: cartesian derived base, fibia, and tibia servo goal values
+    :param x: x cartesian coordinate, or array of them
+    :param y: y cartesian coordinate, or array of them
+    :return: cartesian derived base, fibia, and tibia servo goal values, as
+        ints or as int arrays shaped like `x` and `y`
     """
-    # Convert 2D X and Y into usable numbers
-    two_d_y_as_float = float(y)
-    two_d_y_as_percent = float(two_d_y_as_float / 100)
-    two_d_x_as_float = float(x)
-    two_d_x_as_percent = float(two_d_x_as_float / 100)
+    # Convert 2D X and Y into percents
+    two_d_x_as_percent = np.asarray(x, dtype=np.float64) / 100
+    two_d_y_as_percent = np.asarray(y, dtype=np.float64) / 100
     # Base maths
     # A - Turn X into a percent
     # B - Multiply X against the total travel of ThreeD_Base
@@ -109,9 +114,8 @@ def cartesian_goals(x, y):
     three_d_base_max = 780  # Then pad it some (740 + another say 40)
     three_d_base_min = 328  # Then pad it some (288 - another say 40)
     three_d_base_travel = three_d_base_max - three_d_base_min
-    bg = int(
+    bg = np.trunc(
         three_d_base_max - (three_d_base_travel * two_d_x_as_percent)) - 60
-    logging.info("[cartesian_goals] Base goal position is:{0}".format(bg))
     # Femur maths
     # A - Turn Y into a percent
     # B - Multiply Y against the total travel of ThreeD_Base
@@ -119,9 +123,8 @@ def cartesian_goals(x, y):
     three_d_femur_max = 451  # Then pad it some (550 + another say 40)
     three_d_femur_min = 363  # Then pad it some (420 - another say 40)
     three_d_femur_travel = three_d_femur_max - three_d_femur_min
-    fg = int(
+    fg = np.trunc(
         three_d_femur_max - (three_d_femur_travel * two_d_y_as_percent))
-    logging.info("[cartesian_goals] Femur goal position is:{0}".format(fg))
     # Tibia maths
     # A - Turn X into a percent
     # B - Multiply X against the total travel of threeD_femur
@@ -129,10 +132,9 @@ def cartesian_goals(x, y):
     three_d_tibia_max = 420  # Then pad it some (370 + another say 40)
     three_d_tibia_min = 150  # Then pad it some (135 - another say 40)
     three_d_tibia_travel = three_d_tibia_max - three_d_tibia_min
-    tg = int(
+    tg = np.trunc(
         three_d_tibia_min + (three_d_tibia_travel * two_d_y_as_percent))
-    logging.info("[cartesian_goals] Tibia goal position is:{0}".format(tg))
-    return bg, fg, tg
+    return _goal_ints(bg, fg, tg)
 
 
 def polar_goals(x, y):
@@ -140,77 +142,81 @@ def polar_goals(x, y):
     Use a polar coordinate system to calculate goals from given X and Y
     values.
 
-    :param x: x cartesian coordinate
-    :param y: y cartesian coordinate
-    :return: polar coordinate derived base, fibia, and tibia servo goal values
+    :param x: x cartesian coordinate, or array of them
+    :param y: y cartesian coordinate, or array of them
+    :return: polar coordinate derived base, fibia, and tibia servo goal values,
+        as ints or as int arrays shaped like `x` and `y`
     """
-    if y < 0:
+    if np.any(np.asarray(y) < 0):
         raise ValueError("Cannot accept negative Y values.")
 
     # base servo value which represents 0 degrees. Strongly dependent upon
     # physical construction, servo installation and location of arm
     polar_axis = 210
     polar_180_deg = 810  # base servo value which represents 180 degrees
-    polar_diff = polar_180_deg - polar_axis
+    # the whole servo values per degree the arm was tuned with
+    polar_per_degree = (polar_180_deg - polar_axis) // 180
 
-    x_shift = Decimal(MAX_IMAGE_WIDTH / 2).quantize(
-        exp=Decimal('1.0'), rounding=ROUND_HALF_UP)
-    log.info("[polar_goals] x_shift:{0}".format(x_shift))
     # shift origin of x, y to center of base
-    shifted_x = x - x_shift
-    log.info("[polar_goals] new_x:{0} new_y:{1}".format(shifted_x, y))
-
-    # horizontal kicker to overcome what we think is image parallax
-    if 40 < abs(shifted_x) < 10:
-        shifted_x *= 1.25
-    elif 90 < abs(shifted_x) < 40:
-        shifted_x *= 1.40
+    shifted_x = np.trunc(np.asarray(x) - MAX_IMAGE_WIDTH // 2)
 
     # convert shifted x and y to rho and theta
-    rho, theta = cart2polar(int(shifted_x), int(y))
-    log.info("[polar_goals] r:{0} theta:{1}".format(rho, theta))
+    rho, theta = cart2polar(shifted_x, np.trunc(y))
 
-    # convert theta into base rotation goal
-    bg = int((polar_diff / 180) * theta + polar_axis)
-    # ensure base goal does not go beyond the 180 or 0 servo rotation boundaries
-    if bg > polar_180_deg:
-        bg = polar_180_deg
-    if bg < polar_axis:
-        bg = polar_axis
+    # convert theta into base rotation goal, without going beyond the 180 or
+    # 0 servo rotation boundaries
+    bg = np.clip(np.trunc(polar_per_degree * theta + polar_axis),
+                 polar_axis, polar_180_deg)
 
     bg_cart, fg, tg = cartesian_goals(x, y)
     # Return polar coordinates for base and cartesian for arm goals. We found
     # this combination to work best through experimentation over hours of
     # operation.
-    return bg + 20, fg, tg
+    bg, _, _ = _goal_ints(bg + 20, fg, tg)
+    return bg, fg, tg
+
+
+def _goal_ints(bg, fg, tg):
+    # plain ints for single goals, int arrays for arrays of goals
+    if np.ndim(bg) == 0:
+        return int(bg), int(fg), int(tg)
+    return bg.astype(int), fg.astype(int), tg.astype(int)
 
 
 class ArmStages(object):
-    def __init__(self, servo_group):
+    def __init__(self, servo_group, image_processor=None, goal_table=None):
+        """
+
+        :param servo_group: the ServoGroup of the arm's servos
+        :param image_processor: a long-lived ImageProcessor used by
+            `stage_find`. If None, every `stage_find` uses its own.
+        :param goal_table: a `calibration.GoalTable` or
+            `kinematics.ArmKinematics` that `stage_pick` looks the pick goals
+            of found objects up in. If None, the goals are calculated.
+        """
         super(ArmStages, self).__init__()
         self.sg = servo_group
+        self.ip = image_processor
+        self.goal_table = goal_table
 
     def stage_stop(self):
         log.info("[stage_stop] _begin_")
 
-        self.sg.goal_position([
+        stop = [
             512,  # first servo value
             500,  # second servo value
             500,  # third servo value
-            135,  # fourth servo value
-            OPEN_EFFECTOR  # fifth servo value
-        ], block=True, margin=POSITION_MARGIN)
-
+            135  # fourth servo value
+        ]
         # add little sleepy motion in end effector for fun
-        self.sg['effector']['goal_position'] = GRAB_EFFECTOR
-        time.sleep(0.4)
-        self.sg['effector']['goal_position'] = GRAB_EFFECTOR + 100
-        time.sleep(0.4)
-        self.sg['effector']['goal_position'] = GRAB_EFFECTOR
-        time.sleep(0.4)
-        self.sg['effector']['goal_position'] = GRAB_EFFECTOR + 30
-        time.sleep(0.4)
-        self.sg['effector']['goal_position'] = GRAB_EFFECTOR
+        Trajectory(self.sg).move([
+            Waypoint(stop + [OPEN_EFFECTOR], speed=TRAVEL_SPEED),
+            Waypoint(stop + [GRAB_EFFECTOR], speed=TRAVEL_SPEED),
+            Waypoint(stop + [GRAB_EFFECTOR + 100], speed=TRAVEL_SPEED),
+            Waypoint(stop + [GRAB_EFFECTOR], speed=TRAVEL_SPEED),
+            Waypoint(stop + [GRAB_EFFECTOR + 30], speed=TRAVEL_SPEED),
+            Waypoint(stop + [GRAB_EFFECTOR], speed=TRAVEL_SPEED)
+        ])
 
         log.info("[stage_stop] _end_")
 
@@ -230,15 +236,16 @@ class ArmStages(object):
             return stage_results
 
         # start at the middle-out position for all servos
-        self.sg.goal_position([
-            HOME_BASE,  # first servo value
-            HOME_FEMUR_1,  # second servo value
-            HOME_FEMUR_2,  # third servo value
-            HOME_TIBIA,  # fourth servo value
-            OPEN_EFFECTOR  # fifth servo value
-        ], block=True, margin=POSITION_MARGIN)
-
-        stage_results['reached_home'] = True
+        stage_results['reached_home'] = Trajectory(self.sg).move([
+            Waypoint([
+                HOME_BASE,  # first servo value
+                HOME_FEMUR_1,  # second servo value
+                HOME_FEMUR_2,  # third servo value
+                HOME_TIBIA,  # fourth servo value
+                OPEN_EFFECTOR  # fifth servo value
+            ], speed=TRAVEL_SPEED, margin=POSITION_MARGIN)
+        ], should_run=should_run)
+
         log.info("[stage_home] _end_")
         return stage_results
 
@@ -251,37 +258,87 @@ class ArmStages(object):
             if `is_set()` is True
         :return: a dict containing this stage's results
         """
-        log.info("[stage_find] _begin_")
+        # a streaming camera finds at its frame rate while the scene is
+        # empty, so only the finds of an object are logged at INFO
+        log.debug("[stage_find] _begin_")
         r = dict()
 
-        ip = ImageProcessor(res_width=MAX_IMAGE_WIDTH,
-                            res_height=MAX_IMAGE_HEIGHT)
-        ip.capture_frame()
-
-        log.info('[stage_find] max_pixel_count is:{0}'.format(
-            ip.max_pixel_count))
-        # check to see if the image processor found an object that is larger
-        # than the minimum object size we want to try to pickup
-        if ip.max_pixel_count > MIN_OBJECT_SIZE:
-            print('largest object is:{0}'.format(ip.largest_object_id))
-            print('largest object X coord is:{0}'.format(ip.largest_X))
-            print('largest object Y coord is:{0}'.format(ip.largest_Y))
-            r['x'] = ip.largest_X
-            r['y'] = ip.largest_Y
-            r['filename'] = ip.filename
-            log.info("[stage_find] found object at x:{0} y:{1}".format(
-                r['x'], r['y']))
-            ip.close()
-            log.info("[stage_find] _end_")
-            return r
-        else:
-            # did not find an object larger than the minimum size - return
-            # NO_BOX_FOUND
-            log.info("[stage_find] no object larger than:{0}".format(
-                MIN_OBJECT_SIZE))
-            ip.close()
-            log.info("[stage_find] _end_")
+        ip = self.ip
+        if ip is None:
+            ip = ImageProcessor(res_width=MAX_IMAGE_WIDTH,
+                                res_height=MAX_IMAGE_HEIGHT)
+        try:
+            ip.capture_frame()
+            if ip.frame_reused:
+                log.debug(
+                    "[stage_find] scene unchanged, reusing last results")
+
+            log.debug('[stage_find] max_pixel_count is:{0}'.format(
+                ip.max_pixel_count))
+            # check to see if the image processor found an object that is
+            # larger than the minimum object size we want to try to pickup
+            if ip.max_pixel_count > MIN_OBJECT_SIZE:
+                print('largest object is:{0}'.format(ip.largest_object_id))
+                print('largest object X coord is:{0}'.format(ip.largest_X))
+                print('largest object Y coord is:{0}'.format(ip.largest_Y))
+                r['x'] = ip.largest_X
+                r['y'] = ip.largest_Y
+                r['filename'] = ip.filename
+                # every object worth picking, the largest first
+                r['candidates'] = ip.candidates
+                log.info("[stage_find] found object at x:{0} y:{1}".format(
+                    r['x'], r['y']))
+                log.info("[stage_find] _end_")
+                return r
+            else:
+                # did not find an object larger than the minimum size - return
+                # NO_BOX_FOUND
+                log.debug("[stage_find] no object larger than:{0}".format(
+                    MIN_OBJECT_SIZE))
+                log.debug("[stage_find] _end_")
+                return NO_BOX_FOUND
+        finally:
+            # only close an ImageProcessor this stage opened itself
+            if self.ip is None:
+                ip.close()
+
+    def stage_confirm(self, candidate, should_run=None):
+        """
+        The arm confirms that a candidate found in an earlier frame is still
+        where it was, by searching a fresh frame around the candidate only.
+
+        :param candidate: a candidate dict of an earlier `stage_find`
+        :param should_run: a `threading.Event` that tells the stage to continue
+            if `is_set()` is True
+        :return: a dict containing the candidate's fresh 'x', 'y', 'bbox' and
+            'filename', or NO_BOX_FOUND if it is gone or has moved
+        """
+        log.debug("[stage_confirm] _begin_")
+
+        ip = self.ip
+        if ip is None:
+            ip = ImageProcessor(res_width=MAX_IMAGE_WIDTH,
+                                res_height=MAX_IMAGE_HEIGHT)
+        try:
+            x0, y0, x1, y1 = candidate['bbox']
+            ip.capture_frame(roi=(x0 - CONFIRM_PADDING, y0 - CONFIRM_PADDING,
+                                  x1 + CONFIRM_PADDING, y1 + CONFIRM_PADDING))
+            for found in ip.candidates:
+                if abs(found['x'] - candidate['x']) <= CONFIRM_DISTANCE and \
+                        abs(found['y'] - candidate['y']) <= CONFIRM_DISTANCE:
+                    r = dict(found)
+                    r['filename'] = ip.filename
+                    log.info("[stage_confirm] confirmed x:{0} y:{1}".format(
+                        r['x'], r['y']))
+                    return r
+
+            log.info("[stage_confirm] candidate gone x:{0} y:{1}".format(
+                candidate['x'], candidate['y']))
             return NO_BOX_FOUND
+        finally:
+            # only close an ImageProcessor this stage opened itself
+            if self.ip is None:
+                ip.close()
 
     def stage_pick(self, should_run=None,
                    cli=None, previous_results=None, cartesian=True):
@@ -314,7 +371,18 @@ class ArmStages(object):
             x = previous_results['x']
             y = previous_results['y']
 
-        if cartesian:
+        if self.goal_table is not None and cli is None:
+            # look the calibrated goals up
+            log.info("[stage_pick] x:{0} y:{1} table pickup".format(x, y))
+            goals = self.goal_table.goals_of([(x, y)])[0]
+            if goals is None:
+                log.error("[stage_pick] cannot reach x:{0} y:{1}".format(
+                    x, y))
+                return stage_results
+            base_goal, femur_goal, tibia_goal = goals
+            log.info("[stage_pick] table base:{0} femur:{1} tibia:{2}".format(
+                base_goal, femur_goal, tibia_goal))
+        elif cartesian:
             # use cartesian coordinates to calculate goals
             log.info("[stage_pick] x:{0} y:{1} cartesian pickup".format(x, y))
             base_goal, femur_goal, tibia_goal = cartesian_goals(x, y)
@@ -334,46 +402,46 @@ class ArmStages(object):
                 len(self.sg)))
             return stage_results
 
-        # OPEN EFFECTOR/CLAW
-        #####################################################
-        self.sg.goal_position([
-            HOME_BASE,
-            HOME_FEMUR_1,
-            HOME_FEMUR_2,
-            HOME_TIBIA,
-            OPEN_EFFECTOR
-        ], block=False, margin=POSITION_MARGIN)
-        time.sleep(.5)
-
-        # go to PICK READY location
+        # OPEN EFFECTOR/CLAW, go to PICK READY location, go to down-most
+        # open PICK location, then change effector to the GRAB location
         ######################################################
-        self.sg.goal_position([
-            base_goal,
-            HOME_FEMUR_1,
-            HOME_FEMUR_2,
-            HOME_TIBIA,
-            OPEN_EFFECTOR
-        ], block=False, margin=POSITION_MARGIN)
-        time.sleep(.5)
-
-        self.sg.write_values("moving_speed", [140, 140, 140, 140, 140])
+        trajectory = Trajectory(self.sg)
+        moved = trajectory.move([
+            Waypoint([
+                HOME_BASE,
+                HOME_FEMUR_1,
+                HOME_FEMUR_2,
+                HOME_TIBIA,
+                OPEN_EFFECTOR
+            ], speed=TRAVEL_SPEED, margin=POSITION_MARGIN),
+            Waypoint([
+                base_goal,
+                HOME_FEMUR_1,
+                HOME_FEMUR_2,
+                HOME_TIBIA,
+                OPEN_EFFECTOR
+            ], speed=TRAVEL_SPEED, margin=POSITION_MARGIN),
+            Waypoint([
+                base_goal,
+                femur_goal,
+                femur_goal,
+                tibia_goal,
+                OPEN_EFFECTOR
+            ], speed=PICK_SPEED, margin=SETTLE_MARGIN),
+            Waypoint([
+                base_goal,
+                femur_goal,
+                femur_goal,
+                tibia_goal,
+                GRAB_EFFECTOR
+            ], speed=PICK_SPEED, margin=POSITION_MARGIN,
+                timeout=GRAB_TIMEOUT, stall=True)
+        ], should_run=should_run)
         stage_results['slow_down'] = True
-
-        # go to down-most open PICK location
-        ######################################################
-        self.sg.goal_position([
-            base_goal,
-            femur_goal,
-            femur_goal,
-            tibia_goal,
-            OPEN_EFFECTOR
-        ], block=False, margin=POSITION_MARGIN)
-        time.sleep(.5)
-
-        # change effector to the GRAB location
-        ######################################################
-        self.sg['effector']['goal_position'] = GRAB_EFFECTOR
-        time.sleep(.5)
+        if not moved:
+            log.info("[stage_pick] {0}".format(
+                'timed out' if trajectory.timed_out else 'interrupted'))
+            return stage_results
 
         # TODO: ensure something has been grabbed using torque feedback
 
@@ -406,55 +474,50 @@ class ArmStages(object):
                 len(self.sg)))
             return stage_results
 
-        # slow down the move speed of all servos to reduce dropped objects
+        # go to SORT "high" location, then the SORT "extended" location
+        # slowly to reduce dropped objects, open the end effector/claw to drop
+        # the object, then go to SORT "away" location. The end effector
+        # stalls on the grabbed object until it opens.
         ######################################################
-        self.sg.write_values("moving_speed", [150, 150, 150, 150, 150])
-        stage_results['slow_down'] = True
-
-        # go to SORT "high" location
-        ######################################################
-        self.sg.goal_position([
-            sort_base,  # first servo value
-            HOME_FEMUR_1,  # second servo value
-            HOME_FEMUR_2,  # third servo value
-            sort_tibia,  # fourth servo value
-            GRAB_EFFECTOR  # fifth servo value
-        ], block=False, margin=POSITION_MARGIN)
-        time.sleep(0.5)
+        trajectory = Trajectory(self.sg)
+        moved = trajectory.move([
+            Waypoint([
+                sort_base,  # first servo value
+                HOME_FEMUR_1,  # second servo value
+                HOME_FEMUR_2,  # third servo value
+                sort_tibia,  # fourth servo value
+                GRAB_EFFECTOR  # fifth servo value
+            ], speed=SORT_SPEED, margin=POSITION_MARGIN, stall=True),
+            Waypoint([
+                sort_base,  # first servo value
+                sort_femur_1,  # second servo value
+                sort_femur_2,  # third servo value
+                sort_tibia,  # fourth servo value
+                GRAB_EFFECTOR  # fifth servo value
+            ], speed=SORT_SPEED, margin=POSITION_MARGIN + 15, stall=True),
+            Waypoint([
+                sort_base,  # first servo value
+                sort_femur_1,  # second servo value
+                sort_femur_2,  # third servo value
+                sort_tibia,  # fourth servo value
+                OPEN_EFFECTOR  # fifth servo value
+            ], speed=SORT_SPEED, margin=POSITION_MARGIN),
+            Waypoint([
+                sort_base,  # first servo value
+                sort_femur_1 + 150,  # second servo value
+                sort_femur_2 + 150,  # third servo value
+                HOME_TIBIA,  # fourth servo value
+                OPEN_EFFECTOR  # fifth servo value
+            ], speed=TRAVEL_SPEED, margin=POSITION_MARGIN)
+        ], should_run=should_run)
+        stage_results['slow_down'] = False
+        if not moved:
+            log.info("[stage_sort] {0}".format(
+                'timed out' if trajectory.timed_out else 'interrupted'))
+            return stage_results
         stage_results['raise_complete'] = True
-
-        # go to SORT "extended" location
-        ######################################################
-        self.sg.goal_position([
-            sort_base,  # first servo value
-            sort_femur_1,  # second servo value
-            sort_femur_2,  # third servo value
-            sort_tibia,  # fourth servo value
-            GRAB_EFFECTOR  # fifth servo value
-        ], block=True, margin=POSITION_MARGIN + 15)
-        time.sleep(0.5)
         stage_results['reach_complete'] = True
 
-        # open the end effector/claw to drop object
-        ######################################################
-        self.sg['effector']['goal_position'] = OPEN_EFFECTOR
-        time.sleep(0.5)
-
-        # go to SORT "away" location
-        ######################################################
-        self.sg.goal_position([
-            sort_base,  # first servo value
-            sort_femur_1 + 150,  # second servo value
-            sort_femur_2 + 150,  # third servo value
-            HOME_TIBIA,  # fourth servo value
-            OPEN_EFFECTOR  # fifth servo value
-        ], block=False, margin=POSITION_MARGIN)
-
-        # increase move speed of all servos to normal
-        ######################################################
-        self.sg.write_values("moving_speed", [200, 200, 200, 200, 200])
-        stage_results['slow_down'] = False
-
         # the sort stage is now complete
         stage_results['sort_complete'] = True
         log.info("[stage_sort] _end_")
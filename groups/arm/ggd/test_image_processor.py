@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You may not
+# use this file except in compliance with the License. A copy of the License is
+# located at
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""
+Unit tests of `image_processor`: the run-based object labelling against a
+pixel by pixel flood fill, and the detection of boxes in frames.
+"""
+import unittest
+
+import numpy as np
+
+from image_processor import ImageProcessor, BackgroundModel, \
+    label_pixel_objects, DEBUG_OFF, MORPH_OPEN, MORPH_CLOSE
+from vision_bench import RecordedCamera
+
+
+def flood_fill_objects(bw_rows):
+    """
+    Label the 8-connected objects of white pixels one pixel at a time.
+
+    :return: the list of the set of (x, y) pixels of every object, in the
+        raster order of their first pixel
+    """
+    bw = np.asarray(bw_rows) > 0
+    height, width = bw.shape
+    seen = np.zeros(bw.shape, dtype=bool)
+    objects = list()
+    for y in range(height):
+        for x in range(width):
+            if not bw[y, x] or seen[y, x]:
+                continue
+            pixels = set()
+            stack = [(x, y)]
+            seen[y, x] = True
+            while stack:
+                px, py = stack.pop()
+                pixels.add((px, py))
+                for ny in range(max(py - 1, 0), min(py + 2, height)):
+                    for nx in range(max(px - 1, 0), min(px + 2, width)):
+                        if bw[ny, nx] and not seen[ny, nx]:
+                            seen[ny, nx] = True
+                            stack.append((nx, ny))
+            objects.append(pixels)
+    return objects
+
+
+class LabelPixelObjectsTest(unittest.TestCase):
+
+    def assertLabelledLikeFloodFill(self, bw, offset=(0, 0)):
+        labels, pixel_objects = label_pixel_objects(bw, offset=offset)
+        expected = flood_fill_objects(bw)
+        off_x, off_y = offset
+
+        self.assertEqual(len(pixel_objects), len(expected))
+        for i, (obj, pixels) in enumerate(zip(pixel_objects, expected)):
+            self.assertEqual(obj.id_, i + 1)
+            ys, xs = np.nonzero(labels == obj.id_)
+            self.assertEqual(set(zip(xs.tolist(), ys.tolist())), pixels)
+
+            self.assertEqual(obj.numberOfPixels, len(pixels))
+            self.assertEqual(obj.sum_x, sum(x + off_x for x, _ in pixels))
+            self.assertEqual(obj.sum_y, sum(y + off_y for _, y in pixels))
+            self.assertEqual(obj.min_x, min(x for x, _ in pixels) + off_x)
+            self.assertEqual(obj.max_x, max(x for x, _ in pixels) + off_x)
+            self.assertEqual(obj.min_y, min(y for _, y in pixels) + off_y)
+            self.assertEqual(obj.max_y, max(y for _, y in pixels) + off_y)
+        self.assertEqual(np.count_nonzero(labels), np.count_nonzero(bw))
+
+    def test_shapes(self):
+        bw = np.array([
+            [1, 1, 0, 0, 1, 0, 0, 1],
+            [0, 1, 0, 1, 0, 0, 0, 1],
+            [0, 0, 0, 0, 0, 1, 0, 1],
+            [1, 0, 1, 1, 1, 1, 0, 0],
+            [1, 0, 1, 0, 0, 0, 0, 1],
+            [1, 1, 1, 0, 1, 1, 0, 1],
+        ], dtype=np.uint8)
+        self.assertLabelledLikeFloodFill(bw)
+
+    def test_u_shape_joins_late(self):
+        # both arms start as objects of their own and join on the last row
+        bw = np.array([
+            [1, 0, 0, 0, 1],
+            [1, 0, 0, 0, 1],
+            [1, 1, 1, 1, 1],
+        ], dtype=np.uint8)
+        labels, pixel_objects = label_pixel_objects(bw)
+        self.assertEqual(len(pixel_objects), 1)
+        self.assertLabelledLikeFloodFill(bw)
+
+    def test_random_frames(self):
+        rng = np.random.RandomState(7)
+        for density in (0.1, 0.3, 0.5, 0.7):
+            bw = (rng.random_sample((32, 40)) < density).astype(np.uint8)
+            self.assertLabelledLikeFloodFill(bw)
+
+    def test_offset(self):
+        bw = np.zeros((6, 6), dtype=np.uint8)
+        bw[1:3, 2:5] = 255
+        bw[5, 0] = 255
+        self.assertLabelledLikeFloodFill(bw, offset=(10, 20))
+
+    def test_empty(self):
+        labels, pixel_objects = label_pixel_objects(
+            np.zeros((4, 5), dtype=np.uint8))
+        self.assertEqual(pixel_objects, [])
+        self.assertEqual(np.count_nonzero(labels), 0)
+
+
+def box_frame(x0, y0, x1, y1, width=96, height=96):
+    """
+    :return: the luma rows of a bright box on a dark background
+    """
+    rows = np.full((height, width), 100, dtype=np.uint8)
+    rows[y0:y1, x0:x1] = 200
+    return rows
+
+
+class ImageProcessorTest(unittest.TestCase):
+
+    def processor(self, frames=(), **kwargs):
+        ip = ImageProcessor(camera=RecordedCamera(list(frames)),
+                            debug=DEBUG_OFF, **kwargs)
+        self.addCleanup(ip.close)
+        return ip
+
+    def test_morphology_keeps_the_box(self):
+        for morphology in (None, MORPH_OPEN, MORPH_CLOSE):
+            ip = self.processor(morphology=morphology)
+            ip.process_frame(box_frame(30, 30, 60, 60))
+            self.assertGreater(ip.max_pixel_count, 200, morphology)
+            x0, y0, x1, y1 = ip.largest_bbox
+            self.assertTrue(x0 <= 30 and y0 <= 30 and
+                            x1 >= 59 and y1 >= 59, morphology)
+
+    def test_ready_background_masks_an_unchanged_scene(self):
+        # a rail is in view from the start, and the scene never changes
+        rail = box_frame(0, 40, 96, 56)
+        background = BackgroundModel()
+        ip = self.processor([rail], min_object_size=50,
+                            background=background, similar_frame_diff=6)
+        for i in range(background.min_frames):
+            ip.capture_frame()
+        self.assertTrue(background.ready)
+        self.assertNotEqual(ip.candidates, [])
+
+        # the first frame after the background is ready is not reused, so
+        # the rail is masked as background
+        ip.capture_frame()
+        self.assertFalse(ip.frame_reused)
+        self.assertEqual(ip.candidates, [])
+        ip.capture_frame()
+        self.assertTrue(ip.frame_reused)
+        self.assertEqual(ip.candidates, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You may not
+# use this file except in compliance with the License. A copy of the License is
+# located at
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""
+Unit tests of the arm stages that need no servos, such as `stage_confirm`.
+"""
+import os
+import sys
+import types
+import unittest
+
+import numpy as np
+
+# the stages import the arm's package relative to its parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+try:
+    from ggd import stages
+except ImportError:
+    # the Dynamixel SDK wrapper is only copied in by servo_setup.py, and none
+    # of these tests talk to a servo bus
+    sys.modules['ggd.servo.dynamixel_functions'] = types.ModuleType(
+        'ggd.servo.dynamixel_functions')
+    from ggd import stages
+from ggd.image_processor import ImageProcessor, DEBUG_OFF
+from ggd.vision_bench import RecordedCamera
+from ggd.vision_worker import VisionWorker
+
+
+def box_frame(x0, y0, x1, y1, width=96, height=96):
+    """
+    :return: the luma rows of a bright box on a dark background
+    """
+    rows = np.full((height, width), 100, dtype=np.uint8)
+    rows[y0:y1, x0:x1] = 200
+    return rows
+
+
+class StageConfirmTest(unittest.TestCase):
+
+    def test_confirmed_in_a_fresh_frame(self):
+        box = box_frame(30, 30, 60, 60)
+        ip = ImageProcessor(camera=RecordedCamera([box, box]),
+                            debug=DEBUG_OFF, min_object_size=50)
+        self.addCleanup(ip.close)
+        ip.capture_frame()
+        candidate = ip.candidates[0]
+
+        found = stages.ArmStages(None, image_processor=ip).stage_confirm(
+            candidate)
+        self.assertEqual((found['x'], found['y']),
+                         (candidate['x'], candidate['y']))
+
+    def test_not_confirmed_without_a_frame(self):
+        # the camera times out on the confirming frame
+        ip = ImageProcessor(
+            camera=RecordedCamera([box_frame(30, 30, 60, 60), None]),
+            debug=DEBUG_OFF, min_object_size=50)
+        self.addCleanup(ip.close)
+        ip.capture_frame()
+        candidate = ip.candidates[0]
+
+        found = stages.ArmStages(None, image_processor=ip).stage_confirm(
+            candidate)
+        self.assertEqual(found, stages.NO_BOX_FOUND)
+        self.assertEqual(ip.candidates, [])
+        self.assertFalse(ip.frame_reused)
+
+    def test_worker_not_confirmed_without_a_frame(self):
+        worker = VisionWorker(RecordedCamera([None]))
+        # the results of the last frame the worker processed
+        candidate = {'x': 45, 'y': 50, 'size': 300, 'bbox': (30, 30, 60, 60)}
+        worker.max_pixel_count = candidate['size']
+        worker.candidates = [candidate]
+        worker.frame_reused = True
+
+        found = stages.ArmStages(None, image_processor=worker).stage_confirm(
+            candidate)
+        self.assertEqual(found, stages.NO_BOX_FOUND)
+        self.assertEqual(worker.candidates, [])
+        self.assertFalse(worker.frame_reused)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You may not
+# use this file except in compliance with the License. A copy of the License is
+# located at
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""
+Unit tests of the segment speed planning of `trajectory`.
+"""
+import unittest
+
+from trajectory import segment_speeds, MIN_SPEED, MAX_SPEED, \
+    POSITIONS_PER_SPEED
+
+
+class SegmentSpeedsTest(unittest.TestCase):
+
+    def assertArriveTogether(self, start, goal, speeds, duration):
+        for s, g, speed in zip(start, goal, speeds):
+            distance = abs(g - s)
+            if distance == 0:
+                continue
+            # a speed rounded up arrives at most one speed unit early
+            self.assertLessEqual(
+                distance, speed * POSITIONS_PER_SPEED * duration + 1e-6)
+            self.assertGreater(
+                distance, (speed - 1) * POSITIONS_PER_SPEED * duration)
+
+    def test_furthest_servo_moves_at_speed(self):
+        start = [500, 500, 500, 500]
+        goal = [700, 400, 550, 500]
+        speeds, duration = segment_speeds(start, goal, speed=200)
+
+        self.assertAlmostEqual(duration, 200 / (200 * POSITIONS_PER_SPEED))
+        self.assertEqual(speeds[0], 200)
+        self.assertEqual(speeds[3], 200)  # still, so it keeps the speed
+        self.assertArriveTogether(start, goal, speeds, duration)
+
+    def test_duration_takes_the_place_of_speed(self):
+        start = [100, 100]
+        goal = [400, 200]
+        speeds, duration = segment_speeds(start, goal, speed=10, duration=1.5)
+
+        self.assertEqual(duration, 1.5)
+        self.assertArriveTogether(start, goal, speeds, duration)
+
+    def test_speeds_within_limits(self):
+        speeds, duration = segment_speeds(
+            [0, 0], [1000, 1], duration=0.01)
+        self.assertEqual(speeds[0], MAX_SPEED)
+
+        speeds, duration = segment_speeds(
+            [0, 0], [1000, 1], duration=100)
+        self.assertEqual(speeds[1], MIN_SPEED)
+
+    def test_nothing_moves(self):
+        speeds, duration = segment_speeds([300, 400], [300, 400], speed=150)
+        self.assertEqual(speeds, [150, 150])
+        self.assertEqual(duration, 0.0)
+
+    def test_no_servos(self):
+        self.assertEqual(segment_speeds([], []), ([], 0.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You may not
+# use this file except in compliance with the License. A copy of the License is
+# located at
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""
+Coordinated multi-waypoint moves of a ServoGroup.
+
+A `Trajectory` moves the servos of a group through a list of `Waypoint`s. For
+every segment between two waypoints the `moving_speed` of every servo is
+planned so that all servos arrive at the segment's goal at the same time, the
+servo travelling furthest moving at the segment's speed. The next segment is
+streamed as soon as the servos have completed the current one, instead of
+after a fixed sleep. A waypoint the servos do not reach in time stops the
+move, unless it is a `stall` waypoint that a servo is expected to stop short
+of.
+"""
+import math
+import time
+import logging
+
+log = logging.getLogger('trajectory')
+handler = logging.StreamHandler()
+formatter = logging.Formatter(
+    '%(asctime)s|%(name)-8s|%(levelname)s: %(message)s')
+handler.setFormatter(formatter)
+log.addHandler(handler)
+log.setLevel(logging.INFO)
+
+MIN_SPEED = 1  # the slowest moving_speed, as 0 is the servos' full speed
+MAX_SPEED = 1023  # the fastest controlled moving_speed
+# AX-12 positions per second moved per moving_speed unit: a speed unit is
+# 0.111 rpm and a position unit is 300/1024 degrees
+POSITIONS_PER_SPEED = 0.111 * 360 / 60 / (300.0 / 1024)
+POSITION_MARGIN = 75  # how close to its goal a servo completes a segment
+TIMEOUT_FACTOR = 2  # segment timeout, as a multiple of its planned duration
+MIN_TIMEOUT = 1  # seconds a segment is waited for at least
+
+
+class Waypoint(object):
+    """
+    A goal position of every servo of a group, and how to move to it.
+    """
+
+    def __init__(self, positions, speed=MAX_SPEED, duration=None,
+                 margin=POSITION_MARGIN, timeout=None, stall=False):
+        """
+
+        :param positions: the list of goal positions in servo order
+        :param speed: the moving_speed of the servo travelling furthest to
+            this waypoint
+        :param duration: seconds the move to this waypoint should take. If
+            set, it takes the place of `speed`, within the speed limits.
+        :param margin: how close to its goal position a servo has reached
+            this waypoint. Waypoints that are only passed through can use a
+            wider margin, so the next segment starts earlier.
+        :param timeout: seconds to wait for the servos to reach this waypoint.
+            If None, it is planned from the segment's duration.
+        :param stall: True if a servo is expected to stall short of this
+            waypoint, such as a gripper closing on a box. A timeout then
+            completes the waypoint instead of stopping the move.
+        """
+        super(Waypoint, self).__init__()
+        self.positions = list(positions)
+        self.speed = speed
+        self.duration = duration
+        self.margin = margin
+        self.timeout = timeout
+        self.stall = stall
+
+    def __repr__(self):
+        return '{0}({1})'.format(type(self).__name__, self.positions)
+
+
+def segment_speeds(start, goal, speed=MAX_SPEED, duration=None):
+    """
+    Plan the moving_speed of every servo so that all servos move from their
+    start to their goal positions in the same time.
+
+    :param start: the list of start positions in servo order
+    :param goal: the list of goal positions in servo order
+    :param speed: the moving_speed of the servo travelling furthest
+    :param duration: seconds the move should take, in place of `speed`
+    :return: speeds, duration
+        speeds - the list of moving_speed values in servo order
+        duration - the planned seconds of the move
+    """
+    distances = [abs(g - s) for s, g in zip(start, goal)]
+    furthest = max(distances) if distances else 0
+    if duration is None:
+        duration = furthest / (speed * POSITIONS_PER_SPEED)
+    if duration <= 0:
+        # nothing moves, so the speeds only matter for later moves
+        return [speed] * len(distances), 0.0
+
+    speeds = list()
+    for distance in distances:
+        if distance == 0:
+            speeds.append(speed)
+            continue
+        # rounded first, so float error does not round an exact speed up
+        s = int(math.ceil(
+            round(distance / (duration * POSITIONS_PER_SPEED), 6)))
+        speeds.append(min(max(s, MIN_SPEED), MAX_SPEED))
+    return speeds, duration
+
+
+class Trajectory(object):
+    """
+    Streams coordinated moves through waypoints to a ServoGroup.
+    """
+
+    def __init__(self, servo_group):
+        """
+
+        :param servo_group: the ServoGroup to move
+        """
+        super(Trajectory, self).__init__()
+        self.sg = servo_group
+        self.timed_out = False
+
+    def present_positions(self):
+        return [self.sg[servo]['present_position'] for servo in self.sg]
+
+    def move(self, waypoints, should_run=None):
+        """
+        Move the servos through the waypoints in turn.
+
+        :param waypoints: the list of Waypoints
+        :param should_run: `threading.Event` that interrupts the move when it
+            is cleared
+        :return: True if the move completed, False if it was interrupted or
+            timed out. `timed_out` tells the two apart.
+        """
+        self.timed_out = False
+        start = self.present_positions()
+        began = time.time()
+        for i, waypoint in enumerate(waypoints):
+            if should_run is not None and not should_run.is_set():
+                log.info("[move] interrupted before waypoint:{0}".format(i))
+                return False
+
+            speeds, duration = segment_speeds(
+                start, waypoint.positions, speed=waypoint.speed,
+                duration=waypoint.duration)
+            timeout = waypoint.timeout
+            if timeout is None:
+                timeout = max(duration * TIMEOUT_FACTOR, MIN_TIMEOUT)
+            log.info("[move] waypoint:{0} {1} speeds:{2} duration:{3:.2f}s".
+                     format(i, waypoint, speeds, duration))
+
+            self.sg.goal_position(waypoint.positions, speeds=speeds,
+                                  block=False)
+            reached = self.sg.wait_motion(
+                waypoint.positions, should_run=should_run,
+                margin=waypoint.margin, timeout=timeout)
+            if not reached and should_run is not None and \
+                    not should_run.is_set():
+                log.info("[move] interrupted at waypoint:{0}".format(i))
+                return False
+            if not reached and not waypoint.stall:
+                log.warning("[move] timed out at waypoint:{0} after:{1:.2f}s "
+                            "positions:{2}".format(
+                                i, timeout, self.present_positions()))
+                self.timed_out = True
+                return False
+            start = waypoint.positions
+
+        log.info("[move] {0} waypoints in:{1:.2f}s".format(
+            len(waypoints), time.time() - began))
+        return True
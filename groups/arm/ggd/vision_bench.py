@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You may not
+# use this file except in compliance with the License. A copy of the License is
+# located at
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""
+Offline benchmark of the arm's vision pipeline.
+
+Recorded frames are handed to an `ImageProcessor` by a `RecordedCamera` in
+place of the PiCamera, so `capture_frame` drives the very same pipeline stages
+it drives on an arm. The time spent in every stage, the frames per second and
+how many detections agree with a golden file of the expected detections are
+reported.
+
+Frames are read from a corpus directory:
+    *.png - `raw.png` debug images, which the arm saved already flipped
+    *.yuv - raw YUV420 captures of the camera, as written by `raspiyuv`
+
+Record the golden detections of a corpus with `--write_golden` once, then
+compare every change of the pipeline against them.
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import logging
+import numpy as np
+import png
+
+from image_processor import ImageProcessor, DEBUG_OFF, DEBUG_POLICIES, \
+    EDGE_THRESHOLD, THRESHOLD_MODES, THRESHOLD_FIXED, BackgroundModel
+
+log = logging.getLogger('vision_bench')
+handler = logging.StreamHandler()
+formatter = logging.Formatter(
+    '%(asctime)s|%(name)-8s|%(levelname)s: %(message)s')
+handler.setFormatter(formatter)
+log.addHandler(handler)
+log.setLevel(logging.INFO)
+
+GOLDEN_FILE = 'golden.json'
+# the arm's frame size and detection size, kept here so the bench does not
+# need the servo libraries that `stages` imports
+FRAME_WIDTH = 96
+FRAME_HEIGHT = 96
+MIN_OBJECT_SIZE = 200
+# the ImageProcessor methods that are timed, in pipeline order
+STAGES = [
+    'get_horizontal_edges', 'get_vertical_edges',
+    'fuse_horizontal_and_vertical', 'make_black_and_white',
+    'spread_white_pixels', 'identify_pixel_objects', 'new_one_pixel_png',
+    'write_debug_images'
+]
+
+
+def _raw_resolution(width, height):
+    # the camera pads YUV frames to a multiple of 32 wide and 16 high
+    return (width + 31) // 32 * 32, (height + 15) // 16 * 16
+
+
+def read_png_frame(filename):
+    """
+    Read a `raw.png` debug image as the luma plane the camera captured.
+
+    :param filename: the PNG file
+    :return: 2D uint8 array of luma values
+    """
+    width, height, pixels, meta = png.Reader(filename=filename).asDirect()
+    planes = meta['planes']
+    rows = np.vstack([np.asarray(row, dtype=np.uint8) for row in pixels])
+    rows = rows.reshape(height, width, planes)[:, :, 0]
+    # the ImageProcessor flipped the frame before saving it
+    return rows[::-1, ::-1]
+
+
+def read_yuv_frame(filename, width, height):
+    """
+    Read the luma plane of a raw YUV420 capture.
+
+    :param filename: the YUV file
+    :param width: the width of the captured frame
+    :param height: the height of the captured frame
+    :return: 2D uint8 array of luma values
+    """
+    raw_width, raw_height = _raw_resolution(width, height)
+    data = np.fromfile(filename, dtype=np.uint8)
+    y_plane = data[:raw_width * raw_height].reshape(raw_height, raw_width)
+    return y_plane[:height, :width]
+
+
+def load_corpus(corpus, width, height):
+    """
+    :return: a list of (name, luma) tuples of the corpus' frames sorted by name
+    """
+    frames = list()
+    for filename in sorted(glob.glob(os.path.join(corpus, '*'))):
+        name = os.path.basename(filename)
+        if name.endswith('.png'):
+            frames.append((name, read_png_frame(filename)))
+        elif name.endswith('.yuv'):
+            frames.append((name, read_yuv_frame(filename, width, height)))
+    return frames
+
+
+class RecordedCamera(object):
+    """
+    Stand-in for a `CameraService` that hands out recorded frames.
+    """
+
+    def __init__(self, frames):
+        """
+
+        :param frames: list of 2D luma arrays returned by `capture` in turn
+        """
+        super(RecordedCamera, self).__init__()
+        self.frames = frames
+        self.index = 0
+        self.streaming = False
+
+    def capture(self):
+        frame = self.frames[self.index % len(self.frames)]
+        self.index += 1
+        return frame
+
+    def close(self):
+        pass
+
+
+class StageTimer(object):
+    """
+    Times the stages of an ImageProcessor by wrapping its methods. The time
+    of a stage excludes the time of the stages it calls.
+    """
+
+    def __init__(self, ip, stages=STAGES):
+        super(StageTimer, self).__init__()
+        self.totals = dict((stage, 0.0) for stage in stages)
+        self._children = []
+        for stage in stages:
+            setattr(ip, stage, self._timed(stage, getattr(ip, stage)))
+
+    def _timed(self, stage, method):
+        def timed(*args, **kwargs):
+            self._children.append(0.0)
+            start = time.time()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.time() - start
+                children = self._children.pop()
+                self.totals[stage] += elapsed - children
+                if self._children:
+                    self._children[-1] += elapsed
+        return timed
+
+
+def detection(ip):
+    return {
+        'max_pixel_count': ip.max_pixel_count,
+        'x': ip.largest_X,
+        'y': ip.largest_Y,
+        'detected': ip.max_pixel_count > ip.min_object_size
+    }
+
+
+def agrees(result, golden, tolerance):
+    """
+    :return: True if a detection agrees with its golden detection, that is
+        both find an object, or not, and their centres are within `tolerance`
+        pixels of each other
+    """
+    if result['detected'] != golden['detected']:
+        return False
+    if not result['detected']:
+        return True
+    return abs(result['x'] - golden['x']) <= tolerance and \
+        abs(result['y'] - golden['y']) <= tolerance
+
+
+def bench(frames, repeat=1, **ip_kwargs):
+    """
+    Run the recorded frames through an ImageProcessor.
+
+    :param frames: list of (name, luma) tuples
+    :param repeat: how many times the frames are processed
+    :param ip_kwargs: the keyword arguments of the ImageProcessor
+    :return: elapsed, stage_totals, results
+        elapsed - seconds spent in `capture_frame`
+        stage_totals - dict of the seconds spent in every stage
+        results - dict of the detection of every frame name, from the last
+            repeat
+    """
+    camera = RecordedCamera([luma for name, luma in frames])
+    ip = ImageProcessor(camera=camera, **ip_kwargs)
+    timer = StageTimer(ip)
+    results = dict()
+    elapsed = 0.0
+    try:
+        for _ in range(repeat):
+            for name, luma in frames:
+                start = time.time()
+                ip.capture_frame()
+                elapsed += time.time() - start
+                results[name] = detection(ip)
+    finally:
+        ip.close()
+    return elapsed, timer.totals, results
+
+
+def report(frame_count, elapsed, stage_totals, results, golden, tolerance):
+    print("frames:{0} elapsed:{1:.3f}s fps:{2:.1f}".format(
+        frame_count, elapsed, frame_count / elapsed if elapsed else 0.0))
+    for stage in STAGES:
+        print("  {0:<30} {1:8.3f}ms/frame {2:5.1f}%".format(
+            stage, stage_totals[stage] * 1000 / frame_count,
+            100 * stage_totals[stage] / elapsed if elapsed else 0.0))
+
+    if golden is None:
+        return 0
+    missing = [name for name in results if name not in golden]
+    disagree = [name for name in results
+                if name in golden and
+                not agrees(results[name], golden[name], tolerance)]
+    compared = len(results) - len(missing)
+    print("agreement:{0}/{1} missing_golden:{2}".format(
+        compared - len(disagree), compared, len(missing)))
+    for name in disagree:
+        print("  {0} result:{1} golden:{2}".format(
+            name, results[name], golden[name]))
+    return len(disagree)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark the arm vision pipeline with recorded frames',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('corpus',
+                        help="Directory of the recorded .png and .yuv frames.")
+    parser.add_argument('--golden', default=None,
+                        help="The golden detections file. Defaults to "
+                             "'{0}' in the corpus.".format(GOLDEN_FILE))
+    parser.add_argument('--write_golden', default=False, action='store_true',
+                        help="Record the detections as the golden file.")
+    parser.add_argument('--width', default=FRAME_WIDTH, type=int,
+                        help="The width of the recorded .yuv frames.")
+    parser.add_argument('--height', default=FRAME_HEIGHT, type=int,
+                        help="The height of the recorded .yuv frames.")
+    parser.add_argument('--min_object_size', default=MIN_OBJECT_SIZE,
+                        type=int,
+                        help="Objects larger than this are detections.")
+    parser.add_argument('--repeat', default=10, type=int,
+                        help="How many times the corpus is processed.")
+    parser.add_argument('--tolerance', default=1, type=int,
+                        help="Pixels a detection's centre may be off by.")
+    parser.add_argument('--debug_images', default=DEBUG_OFF,
+                        choices=DEBUG_POLICIES,
+                        help="Which frames have their debug images written.")
+    parser.add_argument('--track', default=False, action='store_true',
+                        help="Track the detected object between frames.")
+    parser.add_argument('--pyramid', default=False, action='store_true',
+                        help="Detect coarse first, then refine.")
+    parser.add_argument('--threshold', default=EDGE_THRESHOLD, type=int,
+                        help="The edge threshold of the 'fixed' mode.")
+    parser.add_argument('--threshold_mode', default=THRESHOLD_FIXED,
+                        choices=THRESHOLD_MODES,
+                        help="How the edge threshold of a frame is chosen.")
+    parser.add_argument('--background', default=False, action='store_true',
+                        help="Learn the empty scene from the frames without "
+                             "detections.")
+    pa = parser.parse_args()
+
+    frames = load_corpus(pa.corpus, pa.width, pa.height)
+    if not frames:
+        parser.error("no .png or .yuv frames in:{0}".format(pa.corpus))
+    height, width = frames[0][1].shape
+    log.info("[bench] corpus:{0} frames:{1} size:{2}x{3}".format(
+        pa.corpus, len(frames), width, height))
+
+    elapsed, stage_totals, results = bench(
+        frames, repeat=pa.repeat, res_width=width, res_height=height,
+        debug=pa.debug_images, min_object_size=pa.min_object_size,
+        track=pa.track, pyramid=pa.pyramid, threshold=pa.threshold,
+        threshold_mode=pa.threshold_mode,
+        background=BackgroundModel() if pa.background else None)
+
+    golden_file = pa.golden or os.path.join(pa.corpus, GOLDEN_FILE)
+    golden = None
+    if pa.write_golden:
+        with open(golden_file, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        log.info("[bench] wrote golden:{0}".format(golden_file))
+    elif os.path.exists(golden_file):
+        with open(golden_file) as f:
+            golden = json.load(f)
+
+    disagreements = report(len(frames) * pa.repeat, elapsed, stage_totals,
+                           results, golden, pa.tolerance)
+    # a non-zero exit status lets the bench gate regressions
+    sys.exit(1 if disagreements else 0)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You may not
+# use this file except in compliance with the License. A copy of the License is
+# located at
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""
+The vision calibration profile of an arm.
+
+Every arm sees its scene under its own lighting. The profile caches the
+camera exposure and the edge threshold calibrated for an arm, so that the arm
+starts with them instead of the fixed defaults.
+
+Calibrate an arm, with its camera looking at the scene from its home position:
+    python vision_profile.py <device_name>_vision.json
+"""
+import os
+import json
+import argparse
+import logging
+import numpy as np
+
+from image_processor import edges, otsu_threshold, MIN_EDGE_THRESHOLD
+
+log = logging.getLogger('vision_profile')
+handler = logging.StreamHandler()
+formatter = logging.Formatter(
+    '%(asctime)s|%(name)-8s|%(levelname)s: %(message)s')
+handler.setFormatter(formatter)
+log.addHandler(handler)
+log.setLevel(logging.INFO)
+
+CALIBRATION_FRAMES = 10  # frames whose thresholds are calibrated on
+
+
+def profile_file(dir_path, device_name):
+    """
+    :return: the file name of the vision profile of an arm device
+    """
+    return os.path.join(dir_path, '{0}_vision.json'.format(device_name))
+
+
+def load_profile(filename):
+    """
+    :return: the profile dict, empty if the profile does not exist
+    """
+    if not os.path.exists(filename):
+        log.info("[load_profile] no profile:{0}".format(filename))
+        return dict()
+
+    with open(filename) as f:
+        profile = json.load(f)
+    log.info("[load_profile] profile:{0} {1}".format(filename, profile))
+    return profile
+
+
+def save_profile(filename, profile):
+    with open(filename, 'w') as f:
+        json.dump(profile, f, indent=2, sort_keys=True)
+    log.info("[save_profile] profile:{0} {1}".format(filename, profile))
+
+
+def calibrate_threshold(frames, min_threshold=MIN_EDGE_THRESHOLD):
+    """
+    Calibrate the edge threshold as the median of the Otsu thresholds of the
+    frames' edges.
+
+    :param frames: list of 2D luma arrays
+    :param min_threshold: the lowest threshold to calibrate
+    :return: the threshold
+    """
+    thresholds = [otsu_threshold(edges(rows)) for rows in frames]
+    log.info("[calibrate_threshold] thresholds:{0}".format(thresholds))
+    return max(int(np.median(thresholds)), min_threshold)
+
+
+if __name__ == '__main__':
+    from camera import CameraService
+    from stages import MAX_IMAGE_WIDTH, MAX_IMAGE_HEIGHT
+
+    parser = argparse.ArgumentParser(
+        description="Calibrate an arm's vision profile",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('profile',
+                        help="The profile file to write.")
+    parser.add_argument('--frames', default=CALIBRATION_FRAMES, type=int,
+                        help="How many frames to calibrate the threshold on.")
+    pa = parser.parse_args()
+
+    with CameraService(resolution=(MAX_IMAGE_WIDTH, MAX_IMAGE_HEIGHT),
+                       streaming=True) as camera:
+        frames = list()
+        while len(frames) < pa.frames:
+            luma = camera.capture()
+            if luma is not None:
+                frames.append(np.array(luma))
+        save_profile(pa.profile, {
+            'exposure': camera.exposure,
+            'threshold': calibrate_threshold(frames)
+        })
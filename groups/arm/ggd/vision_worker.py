@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You may not
+# use this file except in compliance with the License. A copy of the License is
+# located at
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied. See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""
+Frame processing in a dedicated worker process.
+
+The `VisionWorker` stands in for an `ImageProcessor`: frames are still captured
+in the arm process, but they are handed to an `ImageProcessor` running in a
+worker process through shared memory, and its results come back over a queue.
+The CPU heavy image processing then runs on another core of the Pi, instead of
+competing under the GIL with the arm's control and telemetry threads.
+"""
+import ctypes
+import logging
+import multiprocessing
+import numpy as np
+
+from Queue import Empty
+from image_processor import ImageProcessor
+
+log = logging.getLogger('vision_worker')
+handler = logging.StreamHandler()
+formatter = logging.Formatter(
+    '%(asctime)s|%(name)-8s|%(levelname)s: %(message)s')
+handler.setFormatter(formatter)
+log.addHandler(handler)
+log.setLevel(logging.INFO)
+
+WORKER_TIMEOUT = 5  # seconds to wait for the worker to process a frame
+# the ImageProcessor attributes sent back to the arm process for every frame
+RESULT_ATTRIBUTES = [
+    'frame_count', 'filename', 'max_pixel_count', 'largest_object_id',
+    'largest_X', 'largest_Y', 'largest_bbox', 'candidates', 'frame_threshold',
+    'frame_reused'
+]
+
+
+class SharedFrameCamera(object):
+    """
+    Stand-in for a `CameraService` inside the worker process that hands out
+    the frame in shared memory.
+    """
+
+    def __init__(self, frame):
+        super(SharedFrameCamera, self).__init__()
+        self.frame = frame
+        self.streaming = False
+
+    def capture(self):
+        return self.frame
+
+    def close(self):
+        pass
+
+
+def _shared_frame(shared, shape):
+    # a numpy view of the shared memory, without any copy
+    return np.frombuffer(shared, dtype=np.uint8).reshape(shape)
+
+
+def _work(shared, shape, requests, results, ip_kwargs):
+    """
+    The worker process: process the shared frame for every (sequence, roi)
+    request until a None request arrives.
+    """
+    camera = SharedFrameCamera(_shared_frame(shared, shape))
+    ip = ImageProcessor(camera=camera, **ip_kwargs)
+    try:
+        while True:
+            request = requests.get()
+            if request is None:
+                break
+
+            sequence, roi = request
+            ip.capture_frame(roi=roi)
+            results.put((sequence, dict(
+                (name, getattr(ip, name)) for name in RESULT_ATTRIBUTES)))
+    finally:
+        ip.close()
+
+
+class VisionWorker(object):
+    """
+    An `ImageProcessor` stand-in that processes the frames of a camera in a
+    worker process.
+    """
+
+    def __init__(self, camera=None, res_width=96, res_height=96,
+                 timeout=WORKER_TIMEOUT, **ip_kwargs):
+        """
+
+        :param camera: the `CameraService` frames are captured from. It may be
+            set after the worker is started, which keeps the camera's threads
+            out of the forked worker process.
+        :param res_width: the width of the frames to process
+        :param res_height: the height of the frames to process
+        :param timeout: seconds to wait for the worker to process a frame
+        :param ip_kwargs: the other keyword arguments of the worker's
+            ImageProcessor
+        """
+        super(VisionWorker, self).__init__()
+        self.camera = camera
+        self.timeout = timeout
+        self.shape = (res_height, res_width)
+        self.shared = multiprocessing.RawArray(
+            ctypes.c_uint8, res_width * res_height)
+        self.frame = _shared_frame(self.shared, self.shape)
+        ip_kwargs.update(res_width=res_width, res_height=res_height)
+        self.ip_kwargs = ip_kwargs
+        self._new_process()
+        self._sequence = 0
+        self.frame_count = 0
+        self.filename = ''
+        self.frame_threshold = None
+        self.clear_objects()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _new_process(self):
+        # new queues too, as a terminated worker may leave its queues corrupt
+        self.requests = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            name="vision_worker_process", target=_work,
+            args=(self.shared, self.shape, self.requests, self.results,
+                  self.ip_kwargs))
+        self.process.daemon = True
+
+    def restart(self):
+        """
+        Replace the worker process with a new one, such as one that did not
+        process a frame in time and may still be reading the shared frame.
+        """
+        log.warning("[restart] terminating worker pid:{0}".format(
+            self.process.pid))
+        self.process.terminate()
+        self.process.join(self.timeout)
+        self._new_process()
+        self.start()
+
+    def start(self):
+        """
+        Start the worker process.
+
+        :return: this VisionWorker
+        """
+        self.process.start()
+        log.info("[start] worker pid:{0}".format(self.process.pid))
+        return self
+
+    def clear_objects(self):
+        self.max_pixel_count = 0
+        self.largest_object_id = 0
+        self.largest_X = 0
+        self.largest_Y = 0
+        self.largest_bbox = None
+        self.candidates = []
+        self.frame_reused = False
+
+    def capture_frame(self, roi=None):
+        """
+        Capture a frame and wait for the worker to process it. The results are
+        kept in the same attributes as an ImageProcessor keeps them.
+
+        :param roi: (x0, y0, x1, y1) region of the frame to search alone, see
+            `ImageProcessor.search_region`
+        """
+        luma = self.camera.capture()
+        if luma is None:
+            # no frame arrived in time so there is nothing to be found, and
+            # the last frame's objects must not be mistaken for this one's
+            self.clear_objects()
+            return
+
+        # the worker only reads the frame while this process waits for it, as
+        # a worker that did not process its frame in time is restarted
+        self.frame[...] = luma
+        self._sequence += 1
+        self.requests.put((self._sequence, roi))
+        try:
+            sequence, result = self.results.get(timeout=self.timeout)
+        except Empty:
+            log.error("[capture_frame] no result in {0}s".format(
+                self.timeout))
+            self.clear_objects()
+            # the worker may still be reading the shared frame, and the next
+            # frame must not be written under it
+            self.restart()
+            return
+
+        for name, value in result.items():
+            setattr(self, name, value)
+
+    def close(self):
+        if not self.process.is_alive():
+            return
+
+        self.requests.put(None)
+        self.process.join(self.timeout)
+        if self.process.is_alive():
+            log.warning("[close] terminating worker pid:{0}".format(
+                self.process.pid))
+            self.process.terminate()
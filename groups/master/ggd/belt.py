@@ -22,7 +22,7 @@ import collections
 import logging
 
 from cachetools import TTLCache
-from .servo.servode import ServoProtocol, ServoGroup, Servo
+from .servo.servode import ServoProtocol, ServoGroup, Servo, TELEMETRY
 
 import utils
 
@@ -94,23 +94,25 @@ def stage_message(stage, text='', stage_result=None):
 
 def belt_message(servo_group):
     data = []
+    # one block read per servo instead of a read per register
+    now = datetime.datetime.now()
+    snapshot = servo_group.snapshot()
     for servo in servo_group:
+        values = snapshot[servo]
+        # values coalesced from an earlier read when the bus was too busy
+        # are stamped with the time they were read, and marked stale
+        read_time = servo_group[servo].block_time
         data.append({
             "sensor_id": "belt_id_{0:02d}".format(
                 servo_group[servo].servo_id),
-            "ts": datetime.datetime.now().isoformat(),
-            "present_speed":
-                servo_group[servo]['present_speed'],
-            "present_position":
-                servo_group[servo]['present_position'],
-            "present_load":
-                servo_group[servo]['present_load'],
-            "goal_position":
-                servo_group[servo]['goal_position'],
-            "moving":
-                servo_group[servo]['moving'],
-            "torque_limit":
-                servo_group[servo]['torque_limit']
+            "ts": (read_time or now).isoformat(),
+            "stale": read_time is None or read_time < now,
+            "present_speed": values.get('present_speed'),
+            "present_position": values.get('present_position'),
+            "present_load": values.get('present_load'),
+            "goal_position": values.get('goal_position'),
+            "moving": values.get('moving'),
+            "torque_limit": values.get('torque_limit')
         })
 
     msg = {
@@ -308,7 +310,10 @@ class BeltTelemetryThread(threading.Thread):
 
     def run(self):
         while should_loop:
-            msg = belt_message(self.sg)
+            # telemetry waits behind control, or is coalesced when the bus
+            # is busy
+            with self.sg.priority(TELEMETRY):
+                msg = belt_message(self.sg)
             try:
                 self.mqttc.publish(BELT_TELEMETRY_TOPIC, json.dumps(msg), 0)
                 time.sleep(self.frequency)  # 0.1 == 10Hz